@@ -1,15 +1,33 @@
 from flask import Flask, render_template, request, jsonify
 import json
 import os
-import time
-import threading
 import yt_dlp
-from datetime import datetime
 from googleapiclient.discovery import build
+import tracing
+from settings import load_config, store_path
+from dedupe_index import DedupeIndex, video_id_from_url
+from planner import load_rules, plan_videos
+from job_state import JobStore, reached
+from metadata_store import MetadataStore
+from clock import RealClock
+from priority import StageQueue, load_priority_rules, classify
+from slo import LatencyTracker, load_slo, published_at
 
 app = Flask(__name__)
 
 DATA_FILE = "channel_data.json"
+SCAN_INTERVAL = 300  # seconds between channel scans
+
+config = load_config()
+mirror_index = DedupeIndex(store_path(config, "MIRROR_INDEX_FILE"))
+job_store = JobStore(store_path(config, "JOBS_FILE"))
+metadata_store = MetadataStore(store_path(config, "METADATA_FILE"))
+latency_tracker = LatencyTracker(store_path(config, "LATENCY_FILE"), load_slo(config))
+# Set by start_checker(); a VirtualClock lets a harness drive the checker in simulated time
+clock = RealClock()
+
+# Unconfirmed uploads already reported, so each one is only warned about once
+reported_conflicts = set()
 
 # Load channel data
 def load_channel_data():
@@ -24,6 +42,7 @@ def save_channel_data(data):
         json.dump(data, file, indent=4)
 
 # Extract uploaded videos from a channel
+@tracing.traced("scan")
 def get_uploaded_videos(channel_url, start_date):
     ydl_opts = {
         "quiet": True,
@@ -34,48 +53,112 @@ def get_uploaded_videos(channel_url, start_date):
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         info = ydl.extract_info(channel_url, download=False)
         if "entries" in info:
+            # Flat entries often lack upload_date; those are left for the planner to check
             videos = [
                 vid["url"] for vid in info["entries"]
-                if "url" in vid and "upload_date" in vid and vid["upload_date"] >= start_date.replace("-", "")
+                if "url" in vid and (not vid.get("upload_date") or vid["upload_date"] >= start_date.replace("-", ""))
             ]
             return videos
     return []
 
 # Upload video function (Replace this with your existing upload logic)
+# A real implementation must drive its videos().insert request with job_state.resumable_upload()
+@tracing.traced("upload")
 def upload_video(video_url):
     print(f"Uploading: {video_url}")
-    time.sleep(5)  # Simulating upload delay
+    clock.sleep(5)  # Simulating upload delay
     return True  # Return success
 
+def upload_claimed(video_url, upload_channel, uploaded_videos):
+    """Return True if an upload of this video was already started; finished ones are recorded as uploaded."""
+    video_id = video_id_from_url(video_url)
+    job = job_store.get(video_id, upload_channel)
+    if reached(job, "uploaded"):
+        uploaded_videos.add(video_url)
+        mirror_index.record(video_id, upload_channel, job["data"].get("video_id"))
+        return True
+    if reached(job, "upload_started"):
+        if video_id not in reported_conflicts:
+            reported_conflicts.add(video_id)
+            print(f"⚠ An upload of {video_id} to {upload_channel} was started but never confirmed; "
+                  f"check the channel, then run: python job_state.py reset {video_id} \"{upload_channel}\"")
+        return True
+    return False
+
 # Background thread for continuous checking
 def video_checker():
+    priority_rules = load_priority_rules(config)
+    upload_queue = StageQueue("upload", priority_rules["max_wait"], clock)
     while True:
         channel_data = load_channel_data()
         if not channel_data.get("input_channel") or not channel_data.get("start_date"):
-            time.sleep(60)
+            clock.sleep(60)
             continue
 
         input_channel = channel_data["input_channel"]
+        upload_channel = channel_data.get("upload_channel", "Not set")
         start_date = channel_data["start_date"]
         uploaded_videos = set(channel_data.get("uploaded_videos", []))
-
-        new_videos = set(get_uploaded_videos(input_channel, start_date))
-        missing_videos = new_videos - uploaded_videos
+        mirror_index.import_uploaded_videos(uploaded_videos, upload_channel)
+
+        scanned_at = clock.time()
+        # One trace per day; each scan appends its spans to it
+        with tracing.job(f"scan-{clock.now().strftime('%Y%m%d')}"):
+            new_videos = get_uploaded_videos(input_channel, start_date)
+        # Keep the channel's newest-first order and leave out videos already waiting for or past an upload
+        missing_videos = [
+            url for url in dict.fromkeys(new_videos)
+            if url not in uploaded_videos and url not in upload_queue and not upload_claimed(url, upload_channel, uploaded_videos)
+        ]
 
         if missing_videos:
             print(f"Found {len(missing_videos)} new videos!")
-            for video in missing_videos:
-                if upload_video(video):
-                    uploaded_videos.add(video)
+            rules = load_rules(config)
+            rules["start_date"] = start_date
+            # Videos the rules already rejected are judged on their stored metadata instead of being fetched every scan
+            for plan in plan_videos(missing_videos, rules, mirror_index, upload_channel, metadata_store):
+                if not plan["accepted"]:
+                    print(f"Skipping {plan['url']}: {plan['reason']}")
+                    continue
+                priority = classify(plan["info"], scanned_at, priority_rules)
+                job_store.advance(plan["video_id"], upload_channel, "planned", url=plan["url"], priority=priority)
+                latency_tracker.discovered(
+                    plan["video_id"], upload_channel, input_channel, published_at(plan["info"]), priority, scanned_at
+                )
+                upload_queue.put(plan, priority, key=plan["url"])
+
+        # Upload until the next scan is due, so videos it finds can go ahead of any remaining backlog
+        next_scan = scanned_at + SCAN_INTERVAL
+        while len(upload_queue) and clock.time() < next_scan:
+            plan, priority = upload_queue.get(block=False)
+            # Record the intent first so a crash mid-upload can never lead to a second insert
+            if not job_store.claim_upload(plan["video_id"], upload_channel):
+                upload_claimed(plan["url"], upload_channel, uploaded_videos)
+                continue
+            with tracing.job(plan["video_id"]):
+                if upload_video(plan["url"]):
+                    job_store.advance(plan["video_id"], upload_channel, "uploaded")
+                    latency_tracker.uploaded(plan["video_id"], upload_channel, clock.time())
+                    uploaded_videos.add(plan["url"])
+                    mirror_index.record(plan["video_id"], upload_channel)
+        latency_tracker.check(clock.time())
 
         channel_data["uploaded_videos"] = list(uploaded_videos)
-        channel_data["last_checked"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        channel_data["last_checked"] = clock.now().strftime("%Y-%m-%d %H:%M:%S")
         save_channel_data(channel_data)
 
-        time.sleep(300)  # Check every 5 minutes
+        clock.sleep(max(next_scan - clock.time(), 0))
+
+def start_checker(checker_clock=None):
+    """Start the background checker on `checker_clock` (default: wall-clock time) and return its thread."""
+    global clock
+    if checker_clock is not None:
+        clock = checker_clock
+    return clock.spawn(video_checker)
 
-# Start background thread
-threading.Thread(target=video_checker, daemon=True).start()
+# Start background thread (set YT_CHECKER_AUTOSTART=0 to call start_checker() yourself)
+if os.environ.get("YT_CHECKER_AUTOSTART", "1") != "0":
+    start_checker()
 
 @app.route("/")
 def index():
@@ -100,5 +183,21 @@ def get_uploaded_videos_route():
     channel_data = load_channel_data()
     return jsonify({"videos": channel_data.get("uploaded_videos", [])})
 
+@app.route("/video_metadata/<video_id>")
+def video_metadata_route(video_id):
+    metadata = metadata_store.get(video_id)
+    if metadata is None:
+        return jsonify({"error": "Unknown video"}), 404
+    return jsonify(metadata)
+
+@app.route("/recent_videos")
+def recent_videos_route():
+    rows = metadata_store.recent(request.args.get("channel_id"), int(request.args.get("limit", 50)))
+    return jsonify({"videos": [{"id": video_id, "title": title, "upload_date": upload_date} for video_id, title, upload_date in rows]})
+
+@app.route("/latency")
+def latency_route():
+    return jsonify({"channels": latency_tracker.report(), "breaches": latency_tracker.check()})
+
 if __name__ == "__main__":
     app.run(debug=True)
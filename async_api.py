@@ -0,0 +1,269 @@
+import json
+import atexit
+import asyncio
+import threading
+from http import HTTPStatus
+from datetime import datetime, timedelta, timezone
+import aiohttp
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaUploadProgress
+
+API_ROOT = "https://www.googleapis.com/youtube/v3"
+UPLOAD_ROOT = "https://www.googleapis.com/upload/youtube/v3"
+TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+# Shared connection pool limits (all channels, all threads)
+MAX_CONNECTIONS = 100
+MAX_CONNECTIONS_PER_HOST = 10
+KEEPALIVE_TIMEOUT = 60
+
+_sessions = {}
+_loop = None
+_loop_lock = threading.Lock()
+
+class _Response(dict):
+    """Minimal httplib2.Response stand-in (lowercase header dict with a status)."""
+
+    def __init__(self, status, headers):
+        super().__init__(headers)
+        self.status = status
+        self.reason = HTTPStatus(status).phrase if status in HTTPStatus._value2member_map_ else ""
+
+class ApiError(HttpError):
+    """Non-success response from the YouTube Data API; an HttpError, so existing handlers catch it."""
+
+    def __init__(self, status, content, headers=None):
+        super().__init__(_Response(status, headers or {}), content)
+        self.status = status
+
+async def get_session():
+    """Return the pooled keep-alive session for the running event loop."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=MAX_CONNECTIONS,
+            limit_per_host=MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=None, sock_read=300))
+        _sessions[loop] = session
+    return session
+
+async def close_sessions():
+    """Close the pooled session of the running event loop."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+class AsyncYouTubeClient:
+    """asyncio client for the Data API calls this project uses, on a shared connection pool."""
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self._refresh_lock = None
+
+    async def _auth_headers(self):
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            if not self.credentials.token or self.credentials.expired:
+                await self._refresh_token()
+        return {"Authorization": f"Bearer {self.credentials.token}"}
+
+    async def _refresh_token(self):
+        session = await get_session()
+        data = {
+            "client_id": self.credentials.client_id,
+            "client_secret": self.credentials.client_secret,
+            "refresh_token": self.credentials.refresh_token,
+            "grant_type": "refresh_token",
+        }
+        async with session.post(self.credentials.token_uri or TOKEN_URI, data=data) as resp:
+            content = await resp.read()
+            if resp.status != 200:
+                raise ApiError(resp.status, content)
+        token = json.loads(content)
+        self.credentials.token = token["access_token"]
+        # google-auth compares expiry against naive UTC
+        self.credentials.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=token.get("expires_in", 3600))
+
+    async def request(self, method, url, params=None, headers=None, data=None, json_body=None):
+        """Send an authorized request; returns (status, lowercase headers, body bytes)."""
+        session = await get_session()
+        all_headers = await self._auth_headers()
+        all_headers.update(headers or {})
+        async with session.request(method, url, params=params, headers=all_headers, data=data, json=json_body) as resp:
+            content = await resp.read()
+            return resp.status, {k.lower(): v for k, v in resp.headers.items()}, content
+
+    async def _call(self, method, url, expected=(200,), **kwargs):
+        status, headers, content = await self.request(method, url, **kwargs)
+        if status not in expected:
+            raise ApiError(status, content)
+        return json.loads(content) if content else {}
+
+    async def videos_list(self, part, **params):
+        """videos.list"""
+        return await self._call("GET", f"{API_ROOT}/videos", params={"part": part, **params})
+
+    async def thumbnails_set(self, video_id, data, mimetype):
+        """thumbnails.set (simple media upload)"""
+        return await self._call(
+            "POST", f"{UPLOAD_ROOT}/thumbnails/set",
+            params={"videoId": video_id, "uploadType": "media"},
+            headers={"Content-Type": mimetype},
+            data=data,
+        )
+
+    async def start_upload(self, part, body, size, mimetype):
+        """Open a videos.insert resumable session and return its URI."""
+        status, headers, content = await self.request(
+            "POST", f"{UPLOAD_ROOT}/videos",
+            params={"uploadType": "resumable", "part": part},
+            headers={"X-Upload-Content-Length": str(size), "X-Upload-Content-Type": mimetype},
+            json_body=body,
+        )
+        if status != 200 or "location" not in headers:
+            raise ApiError(status, content)
+        return headers["location"]
+
+    async def upload_chunk(self, session_uri, data, offset, size):
+        """PUT one chunk; returns (next offset, video resource or None)."""
+        end = offset + len(data) - 1
+        status, headers, content = await self.request(
+            "PUT", session_uri, headers={"Content-Range": f"bytes {offset}-{end}/{size}"}, data=data
+        )
+        return self._upload_result(status, headers, content)
+
+    async def query_upload(self, session_uri, size):
+        """Ask how many bytes of a session the server has; returns (next offset, video resource or None)."""
+        status, headers, content = await self.request(
+            "PUT", session_uri, headers={"Content-Range": f"bytes */{size}", "Content-Length": "0"}
+        )
+        return self._upload_result(status, headers, content)
+
+    @staticmethod
+    def _upload_result(status, headers, content):
+        if status in (200, 201):
+            return None, json.loads(content)
+        if status == 308:
+            range_header = headers.get("range")
+            return (int(range_header.rsplit("-", 1)[1]) + 1 if range_header else 0), None
+        raise ApiError(status, content)
+
+    async def videos_insert(self, part, body, media, chunk_size, session_uri=None, on_session=None, on_progress=None):
+        """Run the whole videos.insert resumable protocol for a MediaFileUpload-like `media`."""
+        loop = asyncio.get_running_loop()
+        size = media.size()
+        offset = 0
+        if session_uri:
+            offset, resource = await self.query_upload(session_uri, size)
+            if resource:
+                return resource
+        else:
+            session_uri = await self.start_upload(part, body, size, media.mimetype())
+            if on_session:
+                on_session(session_uri)
+
+        while True:
+            data = await loop.run_in_executor(None, media.getbytes, offset, chunk_size)
+            offset, resource = await self.upload_chunk(session_uri, data, offset, size)
+            if resource:
+                return resource
+            if on_progress:
+                on_progress(offset / size)
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-api", daemon=True).start()
+            atexit.register(_shutdown)
+        return _loop
+
+def _shutdown():
+    asyncio.run_coroutine_threadsafe(close_sessions(), _loop).result(timeout=5)
+
+def run(coro):
+    """Run a coroutine on the shared background event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+class _SyncHttp:
+    def __init__(self, client):
+        self.client = client
+
+    def request(self, uri, method="GET", body=None, headers=None):
+        status, response_headers, content = run(self.client.request(method, uri, headers=headers, data=body))
+        return _Response(status, response_headers), content
+
+class _Call:
+    def __init__(self, factory):
+        self._factory = factory
+
+    def execute(self):
+        return run(self._factory())
+
+class _InsertRequest:
+    """Resumable videos.insert request with the googleapiclient HttpRequest attributes job_state uses."""
+
+    def __init__(self, client, http, part, body, media_body):
+        self.client = client
+        self.http = http
+        self.part = part
+        self.body = body
+        self.resumable = media_body
+        self.resumable_uri = None
+        self.resumable_progress = 0
+
+    def next_chunk(self):
+        return run(self._next_chunk())
+
+    async def _next_chunk(self):
+        size = self.resumable.size()
+        chunk_size = self.resumable.chunksize()
+        if chunk_size is None or chunk_size < 0:
+            chunk_size = size
+        if self.resumable_uri is None:
+            self.resumable_uri = await self.client.start_upload(self.part, self.body, size, self.resumable.mimetype())
+
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, self.resumable.getbytes, self.resumable_progress, chunk_size)
+        offset, resource = await self.client.upload_chunk(self.resumable_uri, data, self.resumable_progress, size)
+        if resource:
+            return None, resource
+        self.resumable_progress = offset
+        return MediaUploadProgress(offset, size), None
+
+class _Videos:
+    def __init__(self, api):
+        self.api = api
+
+    def list(self, part, **params):
+        return _Call(lambda: self.api.client.videos_list(part, **params))
+
+    def insert(self, part, body, media_body):
+        return _InsertRequest(self.api.client, self.api.http, part, body, media_body)
+
+class _Thumbnails:
+    def __init__(self, api):
+        self.api = api
+
+    def set(self, videoId, media_body):
+        return _Call(lambda: self.api.client.thumbnails_set(
+            videoId, media_body.getbytes(0, media_body.size()), media_body.mimetype()
+        ))
+
+class PooledYouTube:
+    """Drop-in for the `build("youtube", "v3")` service at existing call sites (videos.insert/list, thumbnails.set)."""
+
+    def __init__(self, credentials):
+        self.client = AsyncYouTubeClient(credentials)
+        self.http = _SyncHttp(self.client)
+
+    def videos(self):
+        return _Videos(self)
+
+    def thumbnails(self):
+        return _Thumbnails(self)
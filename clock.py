@@ -0,0 +1,91 @@
+import time
+import heapq
+import itertools
+import threading
+from datetime import datetime
+
+class RealClock:
+    """Wall-clock time; the default everywhere."""
+
+    def time(self):
+        return time.time()
+
+    def now(self):
+        return datetime.now()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def spawn(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
+
+class VirtualClock:
+    """Deterministic simulated time.
+
+    Threads started with spawn() take turns: exactly one runs at a time, and
+    sleep() hands control to whichever thread wakes up next, jumping the clock
+    straight to that moment instead of waiting.
+    """
+
+    def __init__(self, start=None):
+        self._now = start if start is not None else datetime(2025, 1, 1).timestamp()
+        self._ready = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def time(self):
+        return self._now
+
+    def now(self):
+        return datetime.fromtimestamp(self._now)
+
+    def _schedule(self, wake, event):
+        with self._lock:
+            heapq.heappush(self._ready, (wake, next(self._seq), event))
+
+    def _handoff(self):
+        with self._lock:
+            if not self._ready:
+                return
+            wake, _, event = heapq.heappop(self._ready)
+            self._now = max(self._now, wake)
+        event.set()
+
+    def sleep(self, seconds):
+        event = threading.Event()
+        self._schedule(self._now + max(seconds, 0), event)
+        self._handoff()
+        event.wait()
+
+    def wait(self, waiters):
+        """Block the current thread until notify() is called on the same waiter list."""
+        event = threading.Event()
+        waiters.append(event)
+        self._handoff()
+        event.wait()
+
+    def notify(self, waiters):
+        """Wake the longest-waiting thread in `waiters`, if any."""
+        if waiters:
+            self._schedule(self._now, waiters.pop(0))
+
+    def spawn(self, target, *args):
+        event = threading.Event()
+
+        def run():
+            event.wait()
+            try:
+                target(*args)
+            finally:
+                self._handoff()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self._schedule(self._now, event)
+        return thread
+
+    def run(self, seconds):
+        """Let spawned threads run for `seconds` of simulated time, then return to the caller."""
+        self.sleep(seconds)
@@ -0,0 +1,180 @@
+import re
+import math
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+# Shared record of every source video mirrored to every target channel
+INDEX_FILE = "mirror_index.db"
+
+# Rows written by other processes are reloaded from this far behind the newest timestamp seen, since a
+# writer can commit after another one that stamped its row later
+REFRESH_SLACK = timedelta(minutes=5)
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+VIDEO_ID_PATTERN = re.compile(r"(?:v=|youtu\.be/|shorts/|live/|embed/)([\w-]{11})")
+
+def video_id_from_url(url):
+    """Extract the 11-character YouTube video ID from a URL (or return a bare ID unchanged)."""
+    match = VIDEO_ID_PATTERN.search(url)
+    if match:
+        return match.group(1)
+    return url.split("v=")[-1].split("&")[0].strip()
+
+class BloomFilter:
+    """Fixed-size Bloom filter; false positives are possible, false negatives are not."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1024)
+        self.error_rate = error_rate
+        self.size = int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+class DedupeIndex:
+    """Persistent (source video ID, target channel) -> uploaded video index backed by SQLite."""
+
+    def __init__(self, path=INDEX_FILE, error_rate=0.001):
+        self.path = path
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS mirrored (
+                source_id TEXT NOT NULL,
+                target_channel TEXT NOT NULL,
+                uploaded_id TEXT,
+                uploaded_at TEXT NOT NULL,
+                PRIMARY KEY (source_id, target_channel)
+            ) WITHOUT ROWID"""
+        )
+        self._conn.commit()
+        self._rebuild_bloom()
+
+    @staticmethod
+    def _key(source_id, target_channel):
+        return f"{source_id}\0{target_channel}"
+
+    def _rebuild_bloom(self):
+        """Load every key from disk into a Bloom filter sized for twice the current entries."""
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        total = self._conn.execute("SELECT COUNT(*) FROM mirrored").fetchone()[0]
+        bloom = BloomFilter(total * 2, self.error_rate)
+        watermark = ""
+        for source_id, target_channel, uploaded_at in self._conn.execute("SELECT source_id, target_channel, uploaded_at FROM mirrored"):
+            bloom.add(self._key(source_id, target_channel))
+            watermark = max(watermark, uploaded_at)
+        self._bloom = bloom
+        self._watermark = watermark
+
+    def _refresh(self):
+        """Add rows committed by other connections since the filter was last synced."""
+        # data_version only changes when another connection commits, so this is a no-op for our own writes
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        self._data_version = version
+        since = ""
+        if self._watermark:
+            since = (datetime.strptime(self._watermark, TIME_FORMAT) - REFRESH_SLACK).strftime(TIME_FORMAT)
+        rows = self._conn.execute(
+            "SELECT source_id, target_channel, uploaded_at FROM mirrored WHERE uploaded_at >= ?", (since,)
+        ).fetchall()
+        for source_id, target_channel, uploaded_at in rows:
+            key = self._key(source_id, target_channel)
+            if key not in self._bloom:
+                self._bloom.add(key)
+            self._watermark = max(self._watermark, uploaded_at)
+        if self._bloom.count > self._bloom.capacity:
+            self._rebuild_bloom()
+
+    def _contains(self, source_id, target_channel):
+        # Bloom filter answers most negative lookups without touching disk
+        self._refresh()
+        if self._key(source_id, target_channel) not in self._bloom:
+            return False
+        row = self._conn.execute(
+            "SELECT 1 FROM mirrored WHERE source_id = ? AND target_channel = ?",
+            (source_id, target_channel),
+        ).fetchone()
+        return row is not None
+
+    def contains(self, source_id, target_channel):
+        """Return True if the source video has already been mirrored to the target channel."""
+        with self._lock:
+            return self._contains(source_id, target_channel)
+
+    def get(self, source_id, target_channel):
+        """Return the stored entry as a dict, or None if the video was never mirrored there."""
+        with self._lock:
+            self._refresh()
+            if self._key(source_id, target_channel) not in self._bloom:
+                return None
+            row = self._conn.execute(
+                "SELECT uploaded_id, uploaded_at FROM mirrored WHERE source_id = ? AND target_channel = ?",
+                (source_id, target_channel),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"source_id": source_id, "target_channel": target_channel, "uploaded_id": row[0], "uploaded_at": row[1]}
+
+    def record(self, source_id, target_channel, uploaded_id=None):
+        """Store a completed upload for the source/target pair."""
+        uploaded_at = datetime.now().strftime(TIME_FORMAT)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO mirrored (source_id, target_channel, uploaded_id, uploaded_at) VALUES (?, ?, ?, ?)",
+                (source_id, target_channel, uploaded_id, uploaded_at),
+            )
+            self._conn.commit()
+            self._bloom.add(self._key(source_id, target_channel))
+            self._watermark = max(self._watermark, uploaded_at)
+            if self._bloom.count > self._bloom.capacity:
+                self._rebuild_bloom()
+
+    def import_uploaded_videos(self, video_urls, target_channel):
+        """Seed the index from an existing `uploaded_videos` list (e.g. channel_data.json)."""
+        uploaded_at = datetime.now().strftime(TIME_FORMAT)
+        with self._lock:
+            rows = [
+                (source_id, target_channel, None, uploaded_at)
+                for source_id in {video_id_from_url(url) for url in video_urls}
+                if not self._contains(source_id, target_channel)
+            ]
+            if not rows:
+                return
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO mirrored (source_id, target_channel, uploaded_id, uploaded_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            for source_id, _, _, _ in rows:
+                self._bloom.add(self._key(source_id, target_channel))
+            self._watermark = max(self._watermark, uploaded_at)
+            if self._bloom.count > self._bloom.capacity:
+                self._rebuild_bloom()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM mirrored").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,81 @@
+import re
+
+# Local description rules; per-channel patterns in config.json's DESCRIPTION_FILTER.channels extend these
+DESCRIPTION_RULES = {
+    # Whole lines that promote the original channel; only call-to-action shapes, so ordinary prose that
+    # happens to mention subscribing or links is kept
+    "drop_lines": [
+        r"\b(please|pls)\s+subscribe\b|\b(don'?t forget|make sure|be sure)\s+to\s+subscribe\b|\blike\s*(,|and|&)\s*(comment\s*(,|and|&)\s*)?subscribe\b",
+        r"^\W*subscribe\b(?=(?:\W+\w+){0,7}\W*$)",
+        r"\b(notification bell|hit the bell|turn on notifications|like and share)\b",
+        r"^\W*(follow|find|connect with|join)\s+(me|us)\b",
+        r"\b(business|sponsorship|collab\w*)\s+(inquir\w*|enquir\w*|contact|email)\b",
+        r"^\W*(instagram|twitter|facebook|tiktok|discord|patreon|twitch|snapchat|threads|website)\s*[:|\-–—]",
+        r"^\W*x\s*[:|\-–—]\s*(@|https?://|www\.|x\.com)",
+        r"\blinks?\s+in\s+(my\s+|the\s+)?(bio|description)\b",
+        r"^\W*(all\s+|my\s+|useful\s+|important\s+)?links?\s*(down\s+)?below\W*$",
+    ],
+    # Spans removed from lines that are otherwise kept
+    "strip": [
+        r"(?:https?://|www\.)\S+",
+        r"[\w.+-]+@[\w-]+\.[\w.-]+",
+        r"(?<![\w@])@[\w.-]{3,}",
+    ],
+    # Signs of channel promotion the rules can't safely remove; each one lowers the confidence
+    "suspect": [
+        r"\b(my|our|this)\s+(channel|merch|store|shop|podcast|second channel|community|discord)\b",
+        r"\b(patreon|merch|membership|join this channel|support (me|us|the channel))\b",
+        r"\b(sponsor\w*|promo code|discount code|use code|affiliate)\b",
+        r"\bsubscrib(e|ing)\s+to\s+(my|our|the)\s+channel\b",
+        r"\blinks?\s+(down\s+)?below\b",
+    ],
+}
+SUSPECT_PENALTY = 0.25
+# Dropping more than this share of a description's lines lowers the confidence by the excess
+DROPPED_SHARE_ALLOWANCE = 0.25
+
+# What is left of a line like "Instagram: https://..." once the link is gone
+LABEL_ONLY = re.compile(r"^\W*(?:[\w ]{0,30}[:|\-–—])?\W*$")
+INNER_SPACES = re.compile(r"[ \t]{2,}")
+BLANK_LINES = re.compile(r"\n{3,}")
+
+def compile_rules(metadata, channels=None):
+    """Compile the default rules plus any overrides configured for the video's source channel."""
+    channels = channels or {}
+    overrides = channels.get(metadata.get("channel_id")) or channels.get(metadata.get("channel")) or {}
+    rules = {
+        kind: [re.compile(pattern, re.IGNORECASE) for pattern in patterns + overrides.get(kind, [])]
+        for kind, patterns in DESCRIPTION_RULES.items()
+    }
+    # The channel's own name left in the text usually means a plug the rules missed
+    for name in {metadata.get("channel"), metadata.get("uploader")}:
+        if name and len(name) >= 3:
+            rules["suspect"].append(re.compile(rf"(?<!\w){re.escape(name)}(?!\w)", re.IGNORECASE))
+    return rules
+
+def local_filter(description, rules):
+    """Drop promotional lines and strip links, emails and @handles; returns (text, share of non-blank lines dropped)."""
+    lines = []
+    text_lines = dropped = 0
+    for line in description.splitlines():
+        if line.strip():
+            text_lines += 1
+        if any(pattern.search(line) for pattern in rules["drop_lines"]):
+            dropped += 1
+            continue
+        cleaned = line
+        for pattern in rules["strip"]:
+            cleaned = pattern.sub("", cleaned)
+        if cleaned != line:
+            cleaned = INNER_SPACES.sub(" ", cleaned).strip()
+            if LABEL_ONLY.match(cleaned):
+                dropped += 1
+                continue
+        lines.append(cleaned)
+    return BLANK_LINES.sub("\n\n", "\n".join(lines)).strip(), dropped / text_lines if text_lines else 0.0
+
+def description_confidence(description, rules, dropped_share=0.0):
+    """Estimate how likely the locally filtered text is free of channel references, without losing content (0 to 1)."""
+    hits = sum(len(pattern.findall(description)) for pattern in rules["suspect"])
+    # Heavy cuts may mean a rule matched more than promotion, so let the LLM take a look
+    return max(0.0, 1.0 - SUSPECT_PENALTY * hits - max(0.0, dropped_share - DROPPED_SHARE_ALLOWANCE))
@@ -1,47 +1,140 @@
 import sys
 import os
-import json
+import re
 import pickle
+import threading
+import time
 import subprocess
 import glob
 import pytz
 import pyperclip
+from collections import deque
 from datetime import datetime
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
 from PyQt6.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QLabel, QPushButton, QComboBox,
-    QLineEdit, QTextEdit, QCheckBox, QDateTimeEdit, QMessageBox
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox,
+    QPlainTextEdit, QCheckBox, QDateTimeEdit, QMessageBox, QTableView, QHeaderView, QFileDialog
 )
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from google_auth_oauthlib.flow import InstalledAppFlow
+import tracing
+from settings import load_config, store_path
+from dedupe_index import DedupeIndex, VIDEO_ID_PATTERN, video_id_from_url
+from planner import load_rules, plan_video, fetch_info
+from metadata_store import MetadataStore
+from job_state import JobStore, UPLOAD_CHUNK_SIZE, reached, resumable_upload, verify_upload
+from async_api import PooledYouTube
+from priority import StageQueue, load_priority_rules
+from slo import LatencyTracker, load_slo, published_at
 
 # Load configuration
-CONFIG_FILE = "config.json"
-
-def load_config():
-    with open(CONFIG_FILE, "r") as f:
-        return json.load(f)
-
 config = load_config()
 CLIENT_SECRET_FILE = config["CLIENT_SECRET_FILE"]
 TOKENS_DIR = config["TOKENS_DIR"]
 DOWNLOAD_FOLDER = config["DOWNLOAD_FOLDER"]
 USER_TIMEZONE = config.get("TIMEZONE", "UTC")
-SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+MIRROR_INDEX_FILE = store_path(config, "MIRROR_INDEX_FILE")
+JOBS_FILE = store_path(config, "JOBS_FILE")
+METADATA_FILE = store_path(config, "METADATA_FILE")
+LATENCY_FILE = store_path(config, "LATENCY_FILE")
+PLANNER_RULES = load_rules(config)
+PRIORITY_RULES = load_priority_rules(config)
+USE_ASYNC_API = config.get("USE_ASYNC_API", False)
+SCOPES = ["https://www.googleapis.com/auth/youtube.upload", "https://www.googleapis.com/auth/youtube.readonly"]
+
+# Queue/log refresh rate and log size
+UI_REFRESH_MS = config.get("GUI_REFRESH_MS", 100)
+LOG_LIMIT = config.get("GUI_LOG_LIMIT", 5000)
+
+DOWNLOAD_PROGRESS = re.compile(r"\[download\]\s+([\d.]+)%")
 
 # Ensure tokens directory exists
 os.makedirs(TOKENS_DIR, exist_ok=True)
 
+class JobQueueModel(QAbstractTableModel):
+    """Table model for queued jobs; worker updates are buffered and applied in batches by flush()."""
+
+    COLUMNS = ["Video", "Channel", "Priority", "Status", "Progress"]
+
+    def __init__(self):
+        super().__init__()
+        self.jobs = []
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.jobs)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        job = self.jobs[index.row()]
+        column = index.column()
+        if column == 0:
+            return job["url"]
+        if column == 1:
+            return job["channel"]
+        if column == 2:
+            return job["priority"]
+        if column == 3:
+            return job["status"]
+        return f"{job['progress']:.0f}%"
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def add_jobs(self, jobs):
+        """Append rows (GUI thread only) and return their row numbers."""
+        first = len(self.jobs)
+        self.beginInsertRows(QModelIndex(), first, first + len(jobs) - 1)
+        self.jobs.extend(jobs)
+        self.endInsertRows()
+        return range(first, first + len(jobs))
+
+    def update_job(self, row, **fields):
+        """Record a change for a row; safe to call from any thread."""
+        with self._lock:
+            self._pending.setdefault(row, {}).update(fields)
+
+    def flush(self):
+        """Apply all buffered changes with a single dataChanged signal."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        for row, fields in pending.items():
+            self.jobs[row].update(fields)
+        self.dataChanged.emit(self.index(min(pending), 0), self.index(max(pending), len(self.COLUMNS) - 1))
+
 class YouTubeUploaderApp(QWidget):
     def __init__(self):
         super().__init__()
+        self.log_buffer = deque(maxlen=LOG_LIMIT)
+        self.queue_model = JobQueueModel()
+        self.job_queue = StageQueue("jobs", PRIORITY_RULES["max_wait"])
         self.initUI()
+        self.mirror_index = DedupeIndex(MIRROR_INDEX_FILE)
+        self.job_store = JobStore(JOBS_FILE)
+        self.metadata_store = MetadataStore(METADATA_FILE)
+        self.latency_tracker = LatencyTracker(LATENCY_FILE, load_slo(config), on_alert=self.log)
         self.channels = self.list_channels()
         self.channel_dropdown.addItems(self.channels)
 
+        self.ui_timer = QTimer(self)
+        self.ui_timer.timeout.connect(self.flush_ui)
+        self.ui_timer.start(UI_REFRESH_MS)
+
+        threading.Thread(target=self.run_queue, daemon=True).start()
+
     def initUI(self):
         self.setWindowTitle("YouTube Uploader")
-        self.setGeometry(100, 100, 500, 400)
+        self.setGeometry(100, 100, 900, 700)
         self.setStyleSheet("background-color: #222; color: white;")
 
         layout = QVBoxLayout()
@@ -52,15 +145,22 @@ class YouTubeUploaderApp(QWidget):
         self.channel_dropdown = QComboBox()
         layout.addWidget(self.channel_dropdown)
 
-        self.url_label = QLabel("Enter YouTube Video URL:")
+        self.url_label = QLabel("Enter YouTube Video URLs (one per line):")
         layout.addWidget(self.url_label)
 
-        self.url_input = QLineEdit()
+        self.url_input = QPlainTextEdit()
+        self.url_input.setMaximumHeight(100)
         layout.addWidget(self.url_input)
 
+        url_buttons = QHBoxLayout()
         self.paste_button = QPushButton("Paste")
         self.paste_button.clicked.connect(self.paste_link)
-        layout.addWidget(self.paste_button)
+        url_buttons.addWidget(self.paste_button)
+
+        self.import_button = QPushButton("Import File...")
+        self.import_button.clicked.connect(self.import_file)
+        url_buttons.addWidget(self.import_button)
+        layout.addLayout(url_buttons)
 
         self.schedule_checkbox = QCheckBox("Schedule Upload")
         self.schedule_checkbox.stateChanged.connect(self.toggle_datetime)
@@ -71,16 +171,40 @@ class YouTubeUploaderApp(QWidget):
         self.datetime_picker.setEnabled(False)
         layout.addWidget(self.datetime_picker)
 
-        self.start_button = QPushButton("Start Process")
+        self.start_button = QPushButton("Add to Queue")
         self.start_button.clicked.connect(self.start_process)
         layout.addWidget(self.start_button)
 
-        self.log_output = QTextEdit()
+        self.resume_button = QPushButton("Resume Unfinished Jobs")
+        self.resume_button.clicked.connect(self.resume_jobs)
+        layout.addWidget(self.resume_button)
+
+        self.queue_view = QTableView()
+        self.queue_view.setModel(self.queue_model)
+        self.queue_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.queue_view.verticalHeader().setDefaultSectionSize(22)
+        self.queue_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.queue_view)
+
+        self.log_output = QPlainTextEdit()
         self.log_output.setReadOnly(True)
+        self.log_output.setMaximumBlockCount(LOG_LIMIT)
         layout.addWidget(self.log_output)
 
         self.setLayout(layout)
 
+    def log(self, message):
+        # Safe from worker threads; shown on the next UI refresh
+        self.log_buffer.append(message)
+
+    def flush_ui(self):
+        self.queue_model.flush()
+        lines = []
+        while self.log_buffer:
+            lines.append(self.log_buffer.popleft())
+        if lines:
+            self.log_output.appendPlainText("\n".join(lines))
+
     def list_channels(self):
         return [f.split(".pickle")[0] for f in os.listdir(TOKENS_DIR) if f.endswith(".pickle")]
 
@@ -94,11 +218,25 @@ class YouTubeUploaderApp(QWidget):
             credentials = flow.run_local_server(port=8080)
             with open(token_path, "wb") as token_file:
                 pickle.dump(credentials, token_file)
-            self.log_output.append(f"✅ Credentials saved for {channel_name}")
+            self.log(f"✅ Credentials saved for {channel_name}")
+        if USE_ASYNC_API:
+            return PooledYouTube(credentials)
         return build("youtube", "v3", credentials=credentials)
 
     def paste_link(self):
-        self.url_input.setText(pyperclip.paste())
+        self.url_input.appendPlainText(pyperclip.paste())
+
+    def import_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import URLs", "", "Text files (*.txt *.csv);;All files (*)")
+        if not path:
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            tokens = [token for token in re.split(r"[\s,;\"']+", f.read()) if token]
+        # Only video links; CSV headers, titles and other columns are ignored
+        urls = [token for token in tokens if VIDEO_ID_PATTERN.search(token)]
+        if len(urls) < len(tokens):
+            self.log(f"ℹ Ignored {len(tokens) - len(urls)} value(s) in {os.path.basename(path)} that are not video links")
+        self.enqueue(self.channel_dropdown.currentText(), urls, self.get_schedule_time())
 
     def toggle_datetime(self):
         self.datetime_picker.setEnabled(self.schedule_checkbox.isChecked())
@@ -108,47 +246,130 @@ class YouTubeUploaderApp(QWidget):
         local_time = local_tz.localize(local_time)
         return local_time.astimezone(pytz.utc)
 
+    def get_schedule_time(self):
+        if not self.schedule_checkbox.isChecked():
+            return None
+        local_time = self.datetime_picker.dateTime().toPyDateTime()
+        return self.convert_to_utc(local_time)
+
     def start_process(self):
-        selected_channel = self.channel_dropdown.currentText()
-        youtube_url = self.url_input.text().strip()
+        urls = self.url_input.toPlainText().split()
 
-        if not youtube_url:
+        if not urls:
             QMessageBox.warning(self, "Error", "Please enter a YouTube video URL.")
             return
 
-        self.log_output.append(f"📥 Downloading video: {youtube_url}")
-        video_file, metadata, thumbnail_file = self.download_video(youtube_url)
+        self.enqueue(self.channel_dropdown.currentText(), urls, self.get_schedule_time())
+        self.url_input.clear()
 
-        if not video_file or not metadata:
-            self.log_output.append("❌ Failed to download video.")
+    def resume_jobs(self):
+        selected_channel = self.channel_dropdown.currentText()
+        unfinished = [job for job in self.job_store.unfinished(selected_channel) if job["data"].get("url")]
+        self.log(f"🔄 Resuming {len(unfinished)} unfinished job(s)...")
+        for priority in dict.fromkeys(job["data"].get("priority", "manual") for job in unfinished):
+            urls = [job["data"]["url"] for job in unfinished if job["data"].get("priority", "manual") == priority]
+            self.enqueue(selected_channel, urls, self.get_schedule_time(), priority)
+
+    def enqueue(self, channel_name, urls, schedule_time, priority=None):
+        urls = [url for url in dict.fromkeys(url.strip() for url in urls) if url]
+        if not urls:
             return
+        priority = priority or ("scheduled" if schedule_time else "manual")
+        rows = self.queue_model.add_jobs([
+            {"url": url, "channel": channel_name, "priority": priority, "status": "Queued", "progress": 0} for url in urls
+        ])
+        queued_at = time.time()
+        for row, url in zip(rows, urls):
+            self.job_queue.put((row, channel_name, url, schedule_time, queued_at), priority)
+        self.log(f"➕ Queued {len(urls)} {priority} video(s) for {channel_name}")
+
+    def run_queue(self):
+        while True:
+            (row, channel_name, youtube_url, schedule_time, queued_at), priority = self.job_queue.get()
+            try:
+                with tracing.job(video_id_from_url(youtube_url)):
+                    status = self.process_video(row, channel_name, youtube_url, schedule_time, priority, queued_at)
+            except Exception as e:
+                self.log(f"❌ {youtube_url}: {e}")
+                status = "Failed"
+            self.queue_model.update_job(row, status=status)
+            self.latency_tracker.check()
+
+    def process_video(self, row, channel_name, youtube_url, schedule_time, priority="manual", queued_at=None):
+        source_id = video_id_from_url(youtube_url)
+        job = self.job_store.get(source_id, channel_name)
+
+        if reached(job, "verified"):
+            self.log(f"⏭ Already uploaded to {channel_name}: https://www.youtube.com/watch?v={job['data']['video_id']}")
+            return "Already uploaded"
+
+        if not reached(job, "downloaded"):
+            self.queue_model.update_job(row, status="Planning")
+            plan = plan_video(youtube_url, PLANNER_RULES, self.mirror_index, channel_name)
+            if not plan["accepted"]:
+                self.log(f"⏭ Skipping {youtube_url}: {plan['reason']}")
+                return f"Skipped: {plan['reason']}"
+            self.metadata_store.put(plan["info"])
+            self.job_store.advance(source_id, channel_name, "planned", url=youtube_url, format=plan["format"], priority=priority)
+            self.latency_tracker.discovered(
+                source_id, channel_name, plan["info"].get("channel"), published_at(plan["info"]), priority, queued_at
+            )
 
-        schedule_time = None
-        if self.schedule_checkbox.isChecked():
-            local_time = self.datetime_picker.dateTime().toPyDateTime()
-            schedule_time = self.convert_to_utc(local_time)
+            self.log(f"📥 Downloading video: {youtube_url}")
+            self.queue_model.update_job(row, status="Downloading", progress=0)
+            video_file, metadata, thumbnail_file = self.download_video(
+                youtube_url, plan["format"], lambda percent: self.queue_model.update_job(row, progress=percent)
+            )
 
-        self.log_output.append("📤 Uploading video...")
-        self.upload_video(selected_channel, video_file, metadata, thumbnail_file, schedule_time)
+            if not video_file or not metadata:
+                self.log(f"❌ Failed to download video: {youtube_url}")
+                return "Failed"
+            job = self.job_store.advance(
+                source_id, channel_name, "downloaded",
+                video_file=video_file,
+                thumbnail_file=thumbnail_file,
+            )
 
-    def download_video(self, youtube_url):
-        video_id = youtube_url.split("v=")[-1]
+        if not reached(job, "processed"):
+            metadata = self.load_metadata(youtube_url)
+            body = self.build_upload_body(metadata, schedule_time)
+            job = self.job_store.advance(source_id, channel_name, "processed", body=body)
+
+        self.log(f"📤 Uploading video: {youtube_url}")
+        self.queue_model.update_job(row, status="Uploading", progress=0)
+        video_id = self.upload_video(
+            channel_name, source_id, job["data"]["video_file"], job["data"]["body"], job["data"]["thumbnail_file"],
+            lambda fraction: self.queue_model.update_job(row, progress=fraction * 100)
+        )
+        if not video_id:
+            return "Failed"
+        self.mirror_index.record(source_id, channel_name, video_id)
+        self.latency_tracker.uploaded(source_id, channel_name)
+        self.queue_model.update_job(row, progress=100)
+        return "Done"
+
+    @tracing.traced("download")
+    def download_video(self, youtube_url, format_id=None, on_progress=None):
+        video_id = video_id_from_url(youtube_url)
         command = [
-            "yt-dlp", "--write-info-json", "--write-thumbnail", "--merge-output-format", "mp4",
+            "yt-dlp", "--newline", "--write-thumbnail", "--merge-output-format", "mp4",
             "-o", os.path.join(DOWNLOAD_FOLDER, "%(id)s.%(ext)s"), youtube_url
         ]
-
-        try:
-            subprocess.run(command, check=True)
-        except subprocess.CalledProcessError:
-            return None, None, None
-
-        metadata_file = os.path.join(DOWNLOAD_FOLDER, f"{video_id}.info.json")
-        if not os.path.exists(metadata_file):
+        if format_id:
+            command[1:1] = ["-f", format_id]
+
+        process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8", errors="replace"
+        )
+        for line in process.stdout:
+            match = DOWNLOAD_PROGRESS.search(line)
+            if match and on_progress:
+                on_progress(float(match.group(1)))
+        if process.wait() != 0:
             return None, None, None
 
-        with open(metadata_file, "r", encoding="utf-8") as f:
-            metadata = json.load(f)
+        with tracing.span("metadata"):
+            metadata = self.load_metadata(youtube_url)
 
         video_files = glob.glob(os.path.join(DOWNLOAD_FOLDER, f"{video_id}.*"))
         video_file = next((f for f in video_files if f.endswith(('.mp4', '.mkv', '.webm'))), None)
@@ -156,9 +377,13 @@ class YouTubeUploaderApp(QWidget):
 
         return video_file, metadata, thumbnail_file
 
-    def upload_video(self, channel_name, video_file, metadata, thumbnail_file, schedule_time):
-        youtube = self.authenticate_youtube(channel_name)
+    def load_metadata(self, youtube_url):
+        metadata = self.metadata_store.get(video_id_from_url(youtube_url))
+        if metadata is None:
+            metadata = self.metadata_store.put(fetch_info(youtube_url))
+        return metadata
 
+    def build_upload_body(self, metadata, schedule_time):
         body = {
             "snippet": {
                 "title": metadata.get("title", "Untitled Video"),
@@ -171,23 +396,47 @@ class YouTubeUploaderApp(QWidget):
 
         if schedule_time:
             body["status"]["publishAt"] = schedule_time.isoformat()
+        return body
+
+    @tracing.traced("upload")
+    def upload_video(self, channel_name, source_id, video_file, body, thumbnail_file, on_progress=None):
+        youtube = self.authenticate_youtube(channel_name)
+        job = self.job_store.get(source_id, channel_name)
 
         try:
             request = youtube.videos().insert(
                 part="snippet,status",
                 body=body,
-                media_body=MediaFileUpload(video_file, chunksize=-1, resumable=True)
+                media_body=MediaFileUpload(video_file, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
             )
 
-            response = request.execute()
-            video_id = response["id"]
-            self.log_output.append(f"✅ Video uploaded successfully: https://www.youtube.com/watch?v={video_id}")
-
-            if thumbnail_file:
-                youtube.thumbnails().set(videoId=video_id, media_body=MediaFileUpload(thumbnail_file)).execute()
-                self.log_output.append(f"✅ Thumbnail uploaded successfully.")
+            video_id = resumable_upload(self.job_store, source_id, channel_name, request, on_progress)
+            self.log(f"✅ Video uploaded successfully: https://www.youtube.com/watch?v={video_id}")
+
+            if not reached(job, "thumbnailed"):
+                if thumbnail_file:
+                    # The video is already up; a failed thumbnail must not mark the whole upload as failed
+                    try:
+                        with tracing.span("thumbnail"):
+                            youtube.thumbnails().set(videoId=video_id, media_body=MediaFileUpload(thumbnail_file)).execute()
+                        self.log(f"✅ Thumbnail uploaded successfully.")
+                        self.job_store.advance(source_id, channel_name, "thumbnailed")
+                    except Exception as e:
+                        self.log(f"⚠ Error uploading thumbnail: {e}")
+                else:
+                    self.job_store.advance(source_id, channel_name, "thumbnailed")
+
+            if not reached(self.job_store.get(source_id, channel_name), "thumbnailed"):
+                return video_id
+            if verify_upload(youtube, self.job_store, source_id, channel_name, video_id):
+                if self.job_store.get(source_id, channel_name)["data"].get("upload_status") == "unverified":
+                    self.log(f"⚠ Could not verify the upload: {channel_name}'s token lacks read access. Delete it and sign in again.")
+                else:
+                    self.log("✅ Upload verified.")
+            return video_id
         except Exception as e:
-            self.log_output.append(f"❌ Upload failed: {e}")
+            self.log(f"❌ Upload failed: {e}")
+            return None
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,226 @@
+import sys
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from googleapiclient.errors import HttpError
+import tracing
+from settings import load_config, store_path
+
+# Persistent per-job progress, one row per (source video, target channel)
+JOBS_FILE = "jobs.db"
+
+STAGES = ["planned", "downloaded", "processed", "upload_started", "uploaded", "thumbnailed", "verified"]
+
+# Upload in chunks so the session URI is persisted before most of the file is sent
+UPLOAD_CHUNK_SIZE = 16 * 1024 * 1024
+
+class UploadIntentConflict(Exception):
+    """An earlier insert for this source/target may already have reached YouTube."""
+
+def reached(job, stage):
+    """Return True if the job has completed the given stage (or a later one)."""
+    return job is not None and STAGES.index(job["stage"]) >= STAGES.index(stage)
+
+class JobStore:
+    """SQLite-backed state machine for jobs; stages only ever move forward."""
+
+    def __init__(self, path=JOBS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                source_id TEXT NOT NULL,
+                target_channel TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (source_id, target_channel)
+            )"""
+        )
+
+    def _get(self, source_id, target_channel):
+        row = self._conn.execute(
+            "SELECT stage, data, updated_at FROM jobs WHERE source_id = ? AND target_channel = ?",
+            (source_id, target_channel),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "source_id": source_id,
+            "target_channel": target_channel,
+            "stage": row[0],
+            "data": json.loads(row[1]),
+            "updated_at": row[2],
+        }
+
+    def _put(self, source_id, target_channel, stage, data):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO jobs (source_id, target_channel, stage, data, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (source_id, target_channel, stage, json.dumps(data), datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+
+    def get(self, source_id, target_channel):
+        """Return the job as a dict, or None if it was never planned."""
+        with self._lock:
+            return self._get(source_id, target_channel)
+
+    def advance(self, source_id, target_channel, stage, **data):
+        """Move a job to `stage` (never backwards) and merge `data` into its stored fields."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                job = self._get(source_id, target_channel)
+                merged = dict(job["data"]) if job else {}
+                merged.update(data)
+                if reached(job, stage):
+                    stage = job["stage"]
+                self._put(source_id, target_channel, stage, merged)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._get(source_id, target_channel)
+
+    def claim_upload(self, source_id, target_channel):
+        """Atomically record the intent to insert; returns False if an insert was already started."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                job = self._get(source_id, target_channel)
+                if reached(job, "upload_started"):
+                    self._conn.execute("ROLLBACK")
+                    return False
+                data = dict(job["data"]) if job else {}
+                data["session_uri"] = None
+                self._put(source_id, target_channel, "upload_started", data)
+                self._conn.execute("COMMIT")
+                return True
+            except BaseException:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+
+    def reset(self, source_id, target_channel, stage):
+        """Force a job back to an earlier stage (used to resolve upload intent conflicts by hand)."""
+        with self._lock:
+            job = self._get(source_id, target_channel)
+            if job is None:
+                return None
+            data = dict(job["data"])
+            if STAGES.index(stage) < STAGES.index("upload_started"):
+                data.pop("session_uri", None)
+            self._put(source_id, target_channel, stage, data)
+            return self._get(source_id, target_channel)
+
+    def unfinished(self, target_channel=None):
+        """Return every job that has not reached the final stage, oldest first."""
+        query = "SELECT source_id, target_channel FROM jobs WHERE stage != ?"
+        params = [STAGES[-1]]
+        if target_channel is not None:
+            query += " AND target_channel = ?"
+            params.append(target_channel)
+        with self._lock:
+            keys = self._conn.execute(query + " ORDER BY updated_at", params).fetchall()
+            return [self._get(source_id, channel) for source_id, channel in keys]
+
+def _query_session(request, session_uri):
+    """Ask YouTube how much of an interrupted upload it has; returns the video resource if complete."""
+    size = request.resumable.size()
+    resp, content = request.http.request(
+        session_uri, "PUT", headers={"Content-Range": f"bytes */{size}", "Content-Length": "0"}
+    )
+    if resp.status in (200, 201):
+        return json.loads(content)
+    if resp.status == 308:
+        request.resumable_uri = session_uri
+        range_header = resp.get("range")
+        request.resumable_progress = int(range_header.rsplit("-", 1)[1]) + 1 if range_header else 0
+        return None
+    if resp.status in (404, 410):
+        # The session expired before completing, so no video was created
+        request.resumable_uri = None
+        return False
+    # Anything else (5xx, 429, auth) says nothing about whether the insert finished; starting over could upload twice
+    raise HttpError(resp, content, uri=session_uri)
+
+def resumable_upload(store, source_id, target_channel, request, on_progress=None):
+    """Drive a videos().insert request to completion, inserting at most once per source/target pair."""
+    job = store.get(source_id, target_channel)
+    if reached(job, "uploaded"):
+        return job["data"]["video_id"]
+
+    session_uri = None
+    if reached(job, "upload_started"):
+        session_uri = job["data"].get("session_uri")
+        if not session_uri:
+            raise UploadIntentConflict(
+                f"an upload of {source_id} to {target_channel} was started but never confirmed; "
+                f"check the channel, then run: python job_state.py reset {source_id} \"{target_channel}\""
+            )
+        response = _query_session(request, session_uri)
+        if response:
+            store.advance(source_id, target_channel, "uploaded", video_id=response["id"])
+            return response["id"]
+        if response is False:
+            print(f"⚠ Upload session for {source_id} expired, starting a new one.")
+            session_uri = None
+            store.reset(source_id, target_channel, "processed")
+
+    if session_uri is None and not store.claim_upload(source_id, target_channel):
+        raise UploadIntentConflict(f"{source_id} is already being uploaded to {target_channel}")
+
+    response = None
+    while response is None:
+        try:
+            with tracing.span("upload_chunk"):
+                status, response = request.next_chunk()
+            if status and on_progress:
+                on_progress(status.progress())
+        finally:
+            if request.resumable_uri and request.resumable_uri != session_uri:
+                session_uri = request.resumable_uri
+                store.advance(source_id, target_channel, "upload_started", session_uri=session_uri)
+
+    store.advance(source_id, target_channel, "uploaded", video_id=response["id"])
+    return response["id"]
+
+def _scope_insufficient(error):
+    """True for the 403 returned to tokens authorized before the youtube.readonly scope was requested."""
+    return error.resp.status == 403 and b"insufficient" in (error.content or b"").lower()
+
+def verify_upload(youtube, store, source_id, target_channel, video_id):
+    """Confirm YouTube has received the video and mark the job verified."""
+    try:
+        with tracing.span("status_check"):
+            response = youtube.videos().list(part="status", id=video_id).execute()
+    except HttpError as e:
+        if _scope_insufficient(e):
+            # The insert succeeded; finish the job rather than retrying a check this token can never pass
+            print(f"⚠ Could not verify upload {video_id}: the saved token lacks the youtube.readonly scope. "
+                  f"Delete the channel's token and sign in again to enable verification.")
+            store.advance(source_id, target_channel, "verified", upload_status="unverified")
+            return True
+        print(f"⚠ Could not verify upload {video_id}: {e}")
+        return False
+
+    items = response.get("items", [])
+    if not items or items[0]["status"].get("uploadStatus") in ("failed", "rejected", "deleted"):
+        return False
+    store.advance(source_id, target_channel, "verified", upload_status=items[0]["status"].get("uploadStatus"))
+    return True
+
+if __name__ == "__main__":
+    store = JobStore(store_path(load_config(), "JOBS_FILE"))
+    if len(sys.argv) >= 4 and sys.argv[1] == "reset":
+        stage = sys.argv[4] if len(sys.argv) > 4 else "processed"
+        if stage not in STAGES:
+            print(f"❌ Unknown stage '{stage}'. Choose one of: {', '.join(STAGES)}")
+            sys.exit(1)
+        job = store.reset(sys.argv[2], sys.argv[3], stage)
+        print(f"✅ {sys.argv[2]} → {sys.argv[3]} reset to {stage}" if job else "❌ Job not found.")
+    else:
+        for job in store.unfinished():
+            print(f"{job['source_id']} → {job['target_channel']}: {job['stage']} ({job['updated_at']})")
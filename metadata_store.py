@@ -0,0 +1,75 @@
+import json
+import zlib
+import sqlite3
+import threading
+from datetime import datetime
+
+# Trimmed per-video metadata, keyed by source video ID
+METADATA_FILE = "metadata.db"
+
+# The only info-dict fields the uploader, planner and dashboard read
+FIELDS = (
+    "id", "title", "description", "tags", "categories", "category",
+    "channel", "channel_id", "uploader", "upload_date", "timestamp",
+    "duration", "live_status", "webpage_url", "thumbnail",
+)
+
+def trim_info(info):
+    """Keep only the fields later stages use (drops formats, fragments, subtitles, ...)."""
+    return {field: info[field] for field in FIELDS if info.get(field) is not None}
+
+class MetadataStore:
+    """SQLite store of trimmed, zlib-compressed metadata, indexed by video ID and channel."""
+
+    def __init__(self, path=METADATA_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS metadata (
+                video_id TEXT PRIMARY KEY,
+                channel_id TEXT,
+                upload_date TEXT,
+                title TEXT,
+                data BLOB NOT NULL,
+                updated_at TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS metadata_channel ON metadata (channel_id, upload_date)")
+        self._conn.commit()
+
+    def put(self, info):
+        """Trim a yt-dlp info dict, store it and return the trimmed copy."""
+        metadata = trim_info(info)
+        data = zlib.compress(json.dumps(metadata, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (video_id, channel_id, upload_date, title, data, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    metadata["id"], metadata.get("channel_id"), metadata.get("upload_date"), metadata.get("title"),
+                    data, datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ),
+            )
+            self._conn.commit()
+        return metadata
+
+    def get(self, video_id):
+        """Return the trimmed metadata for a video, or None if it was never stored."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM metadata WHERE video_id = ?", (video_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def recent(self, channel_id=None, limit=50):
+        """Return (video_id, title, upload_date) rows, newest first, without decompressing anything."""
+        query = "SELECT video_id, title, upload_date FROM metadata"
+        params = []
+        if channel_id:
+            query += " WHERE channel_id = ?"
+            params.append(channel_id)
+        query += " ORDER BY upload_date DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
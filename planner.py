@@ -0,0 +1,174 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import yt_dlp
+import tracing
+from dedupe_index import video_id_from_url
+from metadata_store import trim_info
+
+# Default planning rules; override any of them with a "PLANNER" section in config.json
+DEFAULT_RULES = {
+    "start_date": None,          # "YYYY-MM-DD", inclusive
+    "end_date": None,            # "YYYY-MM-DD", inclusive
+    "min_duration": None,        # seconds
+    "max_duration": None,        # seconds
+    "skip_live_status": ["is_live", "is_upcoming", "post_live"],
+    "max_height": 1080,          # highest video resolution to fetch
+    "max_workers": 8,            # concurrent metadata requests
+    "cache_ttl": 3600,           # seconds an info dict is reused for
+}
+
+# Most info dicts kept in memory at once (least recently used are dropped first)
+CACHE_SIZE = 512
+
+# The only format fields select_format() reads
+FORMAT_FIELDS = ("format_id", "vcodec", "acodec", "height", "ext", "tbr", "abr")
+
+_info_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def load_rules(config):
+    """Merge the config's PLANNER section over the default rules."""
+    rules = dict(DEFAULT_RULES)
+    rules.update(config.get("PLANNER", {}))
+    return rules
+
+def slim_info(info):
+    """Reduce a full yt-dlp info dict (often several MB) to the metadata fields plus what format selection needs."""
+    slim = trim_info(info)
+    if info.get("release_timestamp") is not None:
+        slim["release_timestamp"] = info["release_timestamp"]
+    slim["formats"] = [
+        {field: f[field] for field in FORMAT_FIELDS if f.get(field) is not None}
+        for f in info.get("formats") or []
+    ]
+    return slim
+
+@tracing.traced("metadata_fetch")
+def fetch_info(video_url, cache_ttl=DEFAULT_RULES["cache_ttl"]):
+    """Fetch a video's slimmed info dict without downloading any media, reusing cached results."""
+    video_id = video_id_from_url(video_url)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _info_cache.get(video_id)
+        if cached and now - cached[0] < cache_ttl:
+            _info_cache.move_to_end(video_id)
+            return cached[1]
+
+    ydl_opts = {"quiet": True, "no_warnings": True, "skip_download": True}
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = slim_info(ydl.extract_info(video_url, download=False))
+
+    with _cache_lock:
+        _info_cache[video_id] = (now, info)
+        _info_cache.move_to_end(video_id)
+        # Drop expired entries (oldest first), then the least recently used beyond the cap
+        while _info_cache:
+            oldest_id, (fetched, _) = next(iter(_info_cache.items()))
+            if now - fetched < cache_ttl and len(_info_cache) <= CACHE_SIZE:
+                break
+            del _info_cache[oldest_id]
+    return info
+
+def select_format(info, max_height=None):
+    """Pick the best yt-dlp format selector within the height cap, preferring mp4/m4a for merging."""
+    formats = info.get("formats") or []
+
+    def has_video(f):
+        return f.get("vcodec") not in (None, "none")
+
+    def has_audio(f):
+        return f.get("acodec") not in (None, "none")
+
+    def within_cap(f):
+        return max_height is None or (f.get("height") or 0) <= max_height
+
+    def video_rank(f):
+        return (f.get("height") or 0, f.get("ext") == "mp4", f.get("tbr") or 0)
+
+    video_only = [f for f in formats if has_video(f) and not has_audio(f) and within_cap(f)]
+    audio_only = [f for f in formats if has_audio(f) and not has_video(f)]
+    progressive = [f for f in formats if has_video(f) and has_audio(f) and within_cap(f)]
+
+    if video_only and audio_only:
+        best_video = max(video_only, key=video_rank)
+        best_audio = max(audio_only, key=lambda f: (f.get("ext") == "m4a", f.get("abr") or 0))
+        if not progressive or video_rank(best_video) >= video_rank(max(progressive, key=video_rank)):
+            return f"{best_video['format_id']}+{best_audio['format_id']}"
+    if progressive:
+        return max(progressive, key=video_rank)["format_id"]
+    return None
+
+def evaluate(info, rules):
+    """Return the reason a video should be skipped, or None if it passes every rule."""
+    upload_date = info.get("upload_date")
+    if upload_date:
+        if rules["start_date"] and upload_date < rules["start_date"].replace("-", ""):
+            return f"uploaded {upload_date}, before {rules['start_date']}"
+        if rules["end_date"] and upload_date > rules["end_date"].replace("-", ""):
+            return f"uploaded {upload_date}, after {rules['end_date']}"
+
+    live_status = info.get("live_status")
+    if live_status in (rules["skip_live_status"] or []):
+        return f"live status is {live_status}"
+
+    duration = info.get("duration")
+    if duration is not None:
+        if rules["min_duration"] and duration < rules["min_duration"]:
+            return f"too short ({duration}s)"
+        if rules["max_duration"] and duration > rules["max_duration"]:
+            return f"too long ({duration}s)"
+    return None
+
+def plan_video(video_url, rules, mirror_index=None, target_channel=None, metadata_store=None):
+    """Decide whether a single video should be fetched and which format to fetch."""
+    video_id = video_id_from_url(video_url)
+    plan = {"url": video_url, "video_id": video_id, "accepted": False, "reason": None, "format": None, "info": None}
+
+    # Cheapest check first: no network needed
+    if mirror_index is not None and mirror_index.contains(video_id, target_channel):
+        plan["reason"] = f"already mirrored to {target_channel}"
+        return plan
+
+    # Upload date and duration never change, so a stored video that fails them is rejected without a request;
+    # live status does change, so it is only judged on fresh metadata
+    stored = metadata_store.get(video_id) if metadata_store is not None else None
+    if stored is not None:
+        plan["reason"] = evaluate(stored, {**rules, "skip_live_status": []})
+        if plan["reason"]:
+            plan["info"] = stored
+            return plan
+
+    try:
+        info = fetch_info(video_url, rules["cache_ttl"])
+    except yt_dlp.utils.DownloadError as e:
+        plan["reason"] = f"metadata unavailable: {e}"
+        return plan
+
+    if metadata_store is not None:
+        # Kept for rejected videos too, so the next scan can rule them out from the store
+        metadata_store.put(info)
+    plan["info"] = info
+    plan["reason"] = evaluate(info, rules)
+    if plan["reason"]:
+        return plan
+
+    plan["format"] = select_format(info, rules["max_height"])
+    if plan["format"] is None:
+        plan["reason"] = "no downloadable format"
+        return plan
+
+    plan["accepted"] = True
+    return plan
+
+def plan_videos(video_urls, rules, mirror_index=None, target_channel=None, metadata_store=None):
+    """Plan many videos concurrently; returns plans in the order of the input URLs."""
+    video_urls = list(video_urls)
+    if not video_urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(rules["max_workers"], len(video_urls))) as executor:
+        return list(executor.map(
+            lambda url: plan_video(url, rules, mirror_index, target_channel, metadata_store),
+            video_urls,
+        ))
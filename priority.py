@@ -0,0 +1,113 @@
+import threading
+from collections import deque
+from clock import RealClock
+from slo import published_at
+
+# Job priority classes, highest first
+PRIORITIES = ["live-new", "scheduled", "manual", "backfill"]
+
+# Default classification/starvation settings; override any of them with a "PRIORITY" section in config.json
+DEFAULT_PRIORITY_RULES = {
+    "live_window_hours": 24,     # published this recently when discovered -> live-new
+    "max_wait": {                # seconds a class may wait before it is served ahead of higher classes
+        "live-new": None,
+        "scheduled": 1800,
+        "manual": 3600,
+        "backfill": 6 * 3600,
+    },
+}
+
+def load_priority_rules(config):
+    """Merge the config's PRIORITY section over the default rules."""
+    rules = dict(DEFAULT_PRIORITY_RULES)
+    overrides = dict(config.get("PRIORITY", {}))
+    rules["max_wait"] = {**DEFAULT_PRIORITY_RULES["max_wait"], **overrides.pop("max_wait", {})}
+    rules.update(overrides)
+    return rules
+
+def classify(info, discovered_at, rules=DEFAULT_PRIORITY_RULES, manual=False, scheduled=False):
+    """Pick a video's priority class from its metadata and how it entered the pipeline."""
+    if scheduled or info.get("live_status") == "is_upcoming" or (info.get("release_timestamp") or 0) > discovered_at:
+        return "scheduled"
+    if manual:
+        return "manual"
+    published = published_at(info)
+    if published is not None and discovered_at - published <= rules["live_window_hours"] * 3600:
+        return "live-new"
+    return "backfill"
+
+class PriorityBuffer:
+    """Per-class FIFOs served highest class first; an item past its class's max_wait jumps the line."""
+
+    def __init__(self, max_wait=None, clock=None):
+        self.max_wait = max_wait if max_wait is not None else DEFAULT_PRIORITY_RULES["max_wait"]
+        self.clock = clock or RealClock()
+        self.buffers = {priority: deque() for priority in PRIORITIES}
+        self.keys = set()
+        self.served = {priority: 0 for priority in PRIORITIES}
+        self.promoted = 0
+
+    def push(self, item, priority, key=None):
+        """Queue an item; returns False if an item with the same key is already waiting."""
+        if key is not None:
+            if key in self.keys:
+                return False
+            self.keys.add(key)
+        self.buffers[priority].append((self.clock.time(), key, item))
+        return True
+
+    def pop(self):
+        """Remove and return (item, priority); the buffer must not be empty."""
+        now = self.clock.time()
+        chosen, overdue_by = None, None
+        for priority in PRIORITIES:
+            buffer = self.buffers[priority]
+            limit = self.max_wait.get(priority)
+            if buffer and limit is not None and now - buffer[0][0] > limit:
+                late = now - buffer[0][0] - limit
+                if overdue_by is None or late > overdue_by:
+                    chosen, overdue_by = priority, late
+        if chosen is None:
+            chosen = next(priority for priority in PRIORITIES if self.buffers[priority])
+        elif any(self.buffers[priority] for priority in PRIORITIES[:PRIORITIES.index(chosen)]):
+            self.promoted += 1
+        _, key, item = self.buffers[chosen].popleft()
+        self.keys.discard(key)
+        self.served[chosen] += 1
+        return item, chosen
+
+    def depths(self):
+        return {priority: len(buffer) for priority, buffer in self.buffers.items()}
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return sum(len(buffer) for buffer in self.buffers.values())
+
+class StageQueue(PriorityBuffer):
+    """Thread-safe blocking priority queue for one pipeline stage."""
+
+    def __init__(self, name, max_wait=None, clock=None):
+        super().__init__(max_wait, clock)
+        self.name = name
+        self._cond = threading.Condition()
+
+    def put(self, item, priority, key=None):
+        with self._cond:
+            added = self.push(item, priority, key)
+            self._cond.notify()
+            return added
+
+    def get(self, block=True):
+        """Return (item, priority), waiting for one if `block`; returns (None, None) if empty and not blocking."""
+        with self._cond:
+            while not len(self):
+                if not block:
+                    return None, None
+                self._cond.wait()
+            return self.pop()
+
+    def __contains__(self, key):
+        with self._cond:
+            return key in self.keys
@@ -0,0 +1,23 @@
+import os
+import json
+
+# All entry points live here; config.json and relative store paths are resolved against this folder
+PROJECT_FOLDER = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(PROJECT_FOLDER, "config.json")
+
+# Stores shared by every entry point, with their default file names
+STORE_FILES = {
+    "MIRROR_INDEX_FILE": "mirror_index.db",
+    "JOBS_FILE": "jobs.db",
+    "METADATA_FILE": "metadata.db",
+    "LATENCY_FILE": "latency.db",
+}
+
+def load_config():
+    """Load configuration from file."""
+    with open(CONFIG_FILE, "r") as f:
+        return json.load(f)
+
+def store_path(config, key):
+    """Return the absolute path of a shared store, so every entry point opens the same file."""
+    return os.path.join(PROJECT_FOLDER, config.get(key) or STORE_FILES[key])
@@ -0,0 +1,299 @@
+import sys
+import json
+import math
+import random
+import argparse
+import time
+from collections import deque
+from clock import VirtualClock
+from dedupe_index import DedupeIndex
+from planner import DEFAULT_RULES, evaluate
+from priority import PRIORITIES, DEFAULT_PRIORITY_RULES, PriorityBuffer, classify
+from slo import DEFAULT_SLO, METRICS, LatencyTracker, percentile
+
+# YouTube Data API quota costs in units; the default project quota is 10,000 units per day
+QUOTA_COSTS = {"videos.insert": 1600, "thumbnails.set": 50, "videos.list": 1}
+DAY = 86400
+
+class SimQueue(PriorityBuffer):
+    """Stage priority queue whose get() blocks in simulated time."""
+
+    def __init__(self, clock, max_wait=None):
+        super().__init__(max_wait, clock)
+        self.waiters = []
+
+    def put(self, item, priority):
+        self.push(item, priority)
+        self.clock.notify(self.waiters)
+
+    def get(self):
+        while not len(self):
+            self.clock.wait(self.waiters)
+        return self.pop()
+
+class QuotaBucket:
+    """Daily API quota; callers wait for the next reset when it runs out."""
+
+    def __init__(self, clock, daily_units):
+        self.clock = clock
+        self.daily_units = daily_units
+        self.start = clock.time()
+        self.day = 0
+        self.remaining = daily_units
+        self.used = 0
+        self.exhausted_seconds = 0
+        self.exhausted_days = set()
+
+    def _roll_over(self):
+        day = int((self.clock.time() - self.start) // DAY)
+        if day != self.day:
+            self.day = day
+            self.remaining = self.daily_units
+
+    def consume(self, call):
+        units = QUOTA_COSTS[call]
+        self._roll_over()
+        while self.remaining < units:
+            wait = self.start + (self.day + 1) * DAY - self.clock.time()
+            if self.day not in self.exhausted_days:
+                self.exhausted_days.add(self.day)
+                self.exhausted_seconds += wait
+            self.clock.sleep(wait)
+            self._roll_over()
+        self.remaining -= units
+        self.used += units
+
+class Simulation:
+    """Synthetic 'video_checker'-style pipeline: channel polling, planning, download and upload workers."""
+
+    def __init__(self, args):
+        self.args = args
+        self.clock = VirtualClock()
+        self.rng = random.Random(args.seed)
+        self.priority_rules = dict(DEFAULT_PRIORITY_RULES)
+        self.download_queue = SimQueue(self.clock, self.priority_rules["max_wait"])
+        self.upload_queue = SimQueue(self.clock, self.priority_rules["max_wait"])
+        self.quota = QuotaBucket(self.clock, args.daily_quota)
+        self.mirror_index = DedupeIndex(":memory:")
+        self.rules = dict(DEFAULT_RULES)
+        self.stats = {"published": 0, "discovered": 0, "skipped": 0, "downloaded": 0, "uploaded": 0}
+        self.depths = []
+        self.alerts = []
+        slo = dict(DEFAULT_SLO, publish_to_uploaded_minutes=args.slo_minutes)
+        self.latency_tracker = LatencyTracker(":memory:", slo, self.clock, self.alerts.append)
+        self.channels = [self._make_channel(i) for i in range(args.channels)]
+
+    def _make_channel(self, index):
+        """Pre-generate a channel's uploads (Poisson arrivals) so results don't depend on thread order."""
+        start = self.clock.time()
+        end = start + self.args.hours * 3600
+        rate = self.args.videos_per_day / DAY
+        videos = deque()
+        # Older uploads not mirrored yet; all of them are found by the first scan
+        for published in sorted(start - self.rng.uniform(0, self.args.backfill_days * DAY) for _ in range(self.args.backfill_videos)):
+            videos.append(self._make_video(index, len(videos), published))
+        t = start
+        while rate and t < end:
+            t += self.rng.expovariate(rate)
+            if t >= end:
+                break
+            videos.append(self._make_video(index, len(videos), t))
+        return {"name": f"channel-{index}", "videos": videos}
+
+    def _make_video(self, index, number, published):
+        return {
+            "id": f"ch{index}-v{number}",
+            "channel": f"channel-{index}",
+            "published_at": published,
+            "timestamp": published,
+            "size_mb": self.rng.lognormvariate(math.log(self.args.size_mb), 0.6),
+            "duration": int(self.rng.lognormvariate(math.log(600), 0.8)),
+            "live_status": "is_upcoming" if self.rng.random() < self.args.upcoming_ratio else "not_live",
+        }
+
+    def poller(self, channels):
+        while True:
+            for channel in channels:
+                if self.args.scan_seconds:
+                    self.clock.sleep(self.args.scan_seconds)
+                now = self.clock.time()
+                videos = channel["videos"]
+                while videos and videos[0]["published_at"] <= now:
+                    video = videos.popleft()
+                    video["discovered_at"] = now
+                    self.stats["discovered"] += 1
+                    if self.mirror_index.contains(video["id"], "target") or evaluate(video, self.rules):
+                        self.stats["skipped"] += 1
+                        continue
+                    priority = classify(video, now, self.priority_rules)
+                    self.latency_tracker.discovered(video["id"], "target", video["channel"], video["published_at"], priority, now)
+                    # --fifo keeps the classes for reporting but queues everything in one class
+                    self.download_queue.put(video, "manual" if self.args.fifo else priority)
+            self.clock.sleep(self.args.poll_interval)
+
+    def downloader(self):
+        while True:
+            video, priority = self.download_queue.get()
+            self.clock.sleep(video["size_mb"] * 8 / self.args.download_mbps)
+            self.stats["downloaded"] += 1
+            self.upload_queue.put(video, priority)
+
+    def uploader(self):
+        while True:
+            video, _ = self.upload_queue.get()
+            self.quota.consume("videos.insert")
+            self.clock.sleep(video["size_mb"] * 8 / self.args.upload_mbps)
+            self.quota.consume("thumbnails.set")
+            self.quota.consume("videos.list")
+            self.mirror_index.record(video["id"], "target", video["id"])
+            self.latency_tracker.uploaded(video["id"], "target")
+            self.stats["uploaded"] += 1
+
+    def monitor(self):
+        while True:
+            self.depths.append((len(self.download_queue), len(self.upload_queue)))
+            if len(self.depths) % max(int(self.args.slo_check_interval // self.args.sample_interval), 1) == 0:
+                self.latency_tracker.check()
+            self.clock.sleep(self.args.sample_interval)
+
+    def latencies(self, priorities=None):
+        """Latency samples of every channel merged, per metric, plus the start times of jobs not uploaded yet."""
+        merged = {metric: [] for metric in (*METRICS, "pending")}
+        for values in self.latency_tracker.samples(0, priorities).values():
+            for metric, samples in values.items():
+                merged[metric].extend(samples)
+        return merged
+
+    def with_pending(self, latencies):
+        """Publish-to-uploaded samples with every pending job counted at its age so far (a lower bound)."""
+        now = self.clock.time()
+        return latencies["publish_to_uploaded"] + [now - started for started in latencies["pending"]]
+
+    def run(self):
+        self.start = self.clock.time()
+        self.stats["published"] = sum(len(channel["videos"]) for channel in self.channels)
+        for shard in range(self.args.pollers):
+            self.clock.spawn(self.poller, self.channels[shard::self.args.pollers])
+        for _ in range(self.args.download_workers):
+            self.clock.spawn(self.downloader)
+        for _ in range(self.args.upload_workers):
+            self.clock.spawn(self.uploader)
+        self.clock.spawn(self.monitor)
+        self.clock.run(self.args.hours * 3600)
+        return self.report()
+
+    def report(self):
+        hours = self.args.hours
+        latencies = self.latencies()
+        download_depths = [d for d, _ in self.depths] or [0]
+        upload_depths = [u for _, u in self.depths] or [0]
+        return {
+            "hours": hours,
+            "channels": self.args.channels,
+            **self.stats,
+            "throughput_per_hour": self.stats["uploaded"] / hours,
+            "download_queue": {"mean": sum(download_depths) / len(download_depths), "max": max(download_depths), "final": len(self.download_queue)},
+            "upload_queue": {"mean": sum(upload_depths) / len(upload_depths), "max": max(upload_depths), "final": len(self.upload_queue)},
+            "quota": {
+                "used": self.quota.used,
+                "per_hour": self.quota.used / hours,
+                "daily_quota": self.args.daily_quota,
+                "exhausted_hours": self.quota.exhausted_seconds / 3600,
+            },
+            # Completed uploads only; see "pending" and "with_pending" for the jobs still in flight
+            "latency_minutes": minutes(latencies),
+            "pending": {
+                "count": len(latencies["pending"]),
+                "oldest_minutes": (self.clock.time() - min(latencies["pending"])) / 60 if latencies["pending"] else None,
+            },
+            "publish_to_uploaded_with_pending_minutes": percentiles(self.with_pending(latencies)),
+            "priorities": {
+                priority: {
+                    "uploaded": len(samples["publish_to_uploaded"]),
+                    "pending": len(samples["pending"]),
+                    "publish_to_uploaded_minutes": minutes(samples)["publish_to_uploaded"],
+                    "publish_to_uploaded_with_pending_minutes": percentiles(self.with_pending(samples)),
+                }
+                for priority, samples in ((priority, self.latencies([priority])) for priority in PRIORITIES)
+                if samples["publish_to_uploaded"] or samples["pending"]
+            },
+            "starvation_promotions": self.download_queue.promoted + self.upload_queue.promoted,
+            "slo": {
+                "publish_to_uploaded_minutes": self.args.slo_minutes,
+                "alerts": len([alert for alert in self.alerts if alert.startswith("🚨")]),
+                "channels_in_breach": len({channel for channel, _ in self.latency_tracker.breached}),
+            },
+        }
+
+def percentiles(values):
+    return {f"p{pct}": (None if not values else percentile(values, pct) / 60) for pct in (50, 90, 99)}
+
+def minutes(latencies):
+    return {metric: percentiles(latencies[metric]) for metric in METRICS}
+
+def print_report(report, wall_seconds):
+    def fmt(value):
+        return "n/a" if value is None else f"{value:.1f}"
+
+    print(f"🧪 Simulated {report['hours']} h, {report['channels']} channels in {wall_seconds:.1f} s")
+    print(f"Videos: {report['published']} published, {report['discovered']} discovered, "
+          f"{report['skipped']} skipped, {report['downloaded']} downloaded, {report['uploaded']} uploaded")
+    print(f"Throughput: {report['throughput_per_hour']:.1f} uploads/hour")
+    for name in ("download_queue", "upload_queue"):
+        depth = report[name]
+        print(f"{name.replace('_', ' ').capitalize()}: mean {depth['mean']:.1f}, max {depth['max']}, left at end {depth['final']}")
+    quota = report["quota"]
+    print(f"Quota: {quota['used']} units ({quota['per_hour']:.0f}/hour, daily limit {quota['daily_quota']}), "
+          f"exhausted for {quota['exhausted_hours']:.1f} h")
+    print(f"Latency (\"to uploaded\" metrics cover the {report['uploaded']} completed upload(s) only):")
+    for name, values in report["latency_minutes"].items():
+        print(f"  {name.replace('_', ' ')}: p50 {fmt(values['p50'])} min, p90 {fmt(values['p90'])} min, p99 {fmt(values['p99'])} min")
+    pending = report["pending"]
+    if pending["count"]:
+        values = report["publish_to_uploaded_with_pending_minutes"]
+        print(f"Still pending: {pending['count']} job(s), oldest published {fmt(pending['oldest_minutes'])} min ago")
+        print(f"  publish to uploaded incl. pending (lower bound): p50 ≥{fmt(values['p50'])} min, "
+              f"p90 ≥{fmt(values['p90'])} min, p99 ≥{fmt(values['p99'])} min")
+    for priority, values in report["priorities"].items():
+        latency = values["publish_to_uploaded_with_pending_minutes"]
+        print(f"  {priority}: {values['uploaded']} uploaded, {values['pending']} pending, publish to uploaded incl. pending "
+              f"p50 ≥{fmt(latency['p50'])} min, p90 ≥{fmt(latency['p90'])} min, p99 ≥{fmt(latency['p99'])} min")
+    slo = report["slo"]
+    print(f"Starvation promotions: {report['starvation_promotions']}")
+    print(f"SLO ({slo['publish_to_uploaded_minutes']} min publish to uploaded): {slo['alerts']} alert(s), "
+          f"{slo['channels_in_breach']} channel(s) in breach at the end")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the upload pipeline against a synthetic workload in virtual time.")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--channels", type=int, default=500)
+    parser.add_argument("--videos-per-day", type=float, default=2, help="mean uploads per source channel per day")
+    parser.add_argument("--backfill-videos", type=int, default=0, help="older, not yet mirrored uploads per channel at the start")
+    parser.add_argument("--backfill-days", type=float, default=30, help="how far back the backfill videos were published")
+    parser.add_argument("--upcoming-ratio", type=float, default=0.02, help="share of videos that are premieres/upcoming")
+    parser.add_argument("--poll-interval", type=float, default=300, help="seconds between channel scans")
+    parser.add_argument("--scan-seconds", type=float, default=1, help="time to scan one channel")
+    parser.add_argument("--pollers", type=int, default=1)
+    parser.add_argument("--download-workers", type=int, default=4)
+    parser.add_argument("--upload-workers", type=int, default=2)
+    parser.add_argument("--size-mb", type=float, default=150, help="median video size")
+    parser.add_argument("--download-mbps", type=float, default=100)
+    parser.add_argument("--upload-mbps", type=float, default=40)
+    parser.add_argument("--daily-quota", type=int, default=10000)
+    parser.add_argument("--fifo", action="store_true", help="put every job in one class (no priorities) for comparison")
+    parser.add_argument("--slo-minutes", type=float, default=DEFAULT_SLO["publish_to_uploaded_minutes"], help="publish to uploaded SLO")
+    parser.add_argument("--slo-check-interval", type=float, default=900, help="seconds between SLO checks")
+    parser.add_argument("--sample-interval", type=float, default=60, help="seconds between queue depth samples")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    started = time.perf_counter()
+    report = Simulation(args).run()
+    if args.json:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+    else:
+        print_report(report, time.perf_counter() - started)
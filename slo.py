@@ -0,0 +1,174 @@
+import math
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from clock import RealClock
+from settings import load_config, store_path
+
+# Per-video source-publish -> discovered -> re-uploaded timestamps, one row per (source video, target channel)
+LATENCY_FILE = "latency.db"
+
+METRICS = ("publish_to_discovered", "discovered_to_uploaded", "publish_to_uploaded")
+
+# Default SLO; override any of it with an "SLO" section in config.json
+DEFAULT_SLO = {
+    "percentile": 90,                       # percentile compared against the limits below
+    "window_hours": 24,                     # only videos discovered this recently count
+    "min_samples": 5,                       # don't judge a channel on fewer videos than this
+    "priorities": ["live-new", "scheduled"],  # classes the SLO applies to
+    "publish_to_discovered_minutes": 15,
+    "discovered_to_uploaded_minutes": None,
+    "publish_to_uploaded_minutes": 60,
+    "channels": {},                         # per source channel overrides, e.g. {"https://...": {"publish_to_uploaded_minutes": 30}}
+}
+
+def load_slo(config):
+    """Merge the config's SLO section over the default SLO."""
+    slo = dict(DEFAULT_SLO)
+    slo.update(config.get("SLO", {}))
+    return slo
+
+def published_at(info):
+    """Return when the source video went public as a Unix timestamp, or None if unknown."""
+    timestamp = info.get("release_timestamp") or info.get("timestamp")
+    if timestamp:
+        return float(timestamp)
+    if info.get("upload_date"):
+        return datetime.strptime(info["upload_date"], "%Y%m%d").replace(tzinfo=timezone.utc).timestamp()
+    return None
+
+def percentile(values, pct):
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(pct / 100 * len(ordered))) - 1)]
+
+class LatencyTracker:
+    """Records pipeline timestamps per video and checks per-channel latency percentiles against the SLO."""
+
+    def __init__(self, path=LATENCY_FILE, slo=None, clock=None, on_alert=print):
+        self.path = path
+        self.slo = slo or dict(DEFAULT_SLO)
+        self.clock = clock or RealClock()
+        self.on_alert = on_alert
+        self.breached = set()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS latency (
+                source_id TEXT NOT NULL,
+                target_channel TEXT NOT NULL,
+                source_channel TEXT,
+                priority TEXT NOT NULL,
+                published_at REAL,
+                discovered_at REAL NOT NULL,
+                uploaded_at REAL,
+                PRIMARY KEY (source_id, target_channel)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS latency_discovered ON latency (discovered_at)")
+        self._conn.commit()
+
+    def discovered(self, source_id, target_channel, source_channel, published, priority, discovered_at=None):
+        """Record the first time a video was seen; later sightings keep the original time."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO latency (source_id, target_channel, source_channel, priority, published_at, discovered_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (source_id, target_channel, source_channel, priority, published,
+                 self.clock.time() if discovered_at is None else discovered_at),
+            )
+            self._conn.commit()
+
+    def uploaded(self, source_id, target_channel, uploaded_at=None):
+        """Record when the re-upload finished."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE latency SET uploaded_at = ? WHERE source_id = ? AND target_channel = ? AND uploaded_at IS NULL",
+                (self.clock.time() if uploaded_at is None else uploaded_at, source_id, target_channel),
+            )
+            self._conn.commit()
+
+    def _rows(self, since, priorities):
+        query = "SELECT source_channel, priority, published_at, discovered_at, uploaded_at FROM latency WHERE discovered_at >= ?"
+        params = [since]
+        if priorities:
+            query += f" AND priority IN ({', '.join('?' for _ in priorities)})"
+            params.extend(priorities)
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def samples(self, since=None, priorities=None):
+        """Return {source channel: {metric: [seconds, ...], "pending": [start, ...]}} for videos not uploaded yet."""
+        if since is None:
+            since = self.clock.time() - self.slo["window_hours"] * 3600
+        channels = {}
+        for channel, _, published, discovered, uploaded in self._rows(since, priorities):
+            values = channels.setdefault(channel, {**{metric: [] for metric in METRICS}, "pending": []})
+            if published is not None:
+                values["publish_to_discovered"].append(max(discovered - published, 0))
+            if uploaded is None:
+                values["pending"].append(published if published is not None else discovered)
+                continue
+            values["discovered_to_uploaded"].append(uploaded - discovered)
+            if published is not None:
+                values["publish_to_uploaded"].append(max(uploaded - published, 0))
+        return channels
+
+    def report(self, since=None, priorities=None, percentiles=(50, 90, 99)):
+        """Per-channel latency percentiles in minutes."""
+        report = {}
+        for channel, values in self.samples(since, priorities).items():
+            report[channel] = {"videos": len(values["discovered_to_uploaded"]) + len(values["pending"]), "pending": len(values["pending"])}
+            for metric in METRICS:
+                report[channel][metric] = {
+                    f"p{pct}": (None if not values[metric] else percentile(values[metric], pct) / 60) for pct in percentiles
+                }
+        return report
+
+    def _limits(self, channel):
+        slo = {**self.slo, **self.slo["channels"].get(channel, {})}
+        return slo, {metric: slo[f"{metric}_minutes"] for metric in METRICS if slo.get(f"{metric}_minutes")}
+
+    def check(self, now=None):
+        """Compare every channel against the SLO, alert on new breaches and recoveries, and return current breaches."""
+        now = self.clock.time() if now is None else now
+        breaches = []
+        since = now - self.slo["window_hours"] * 3600
+        for channel, values in self.samples(since, self.slo["priorities"]).items():
+            slo, limits = self._limits(channel)
+            for metric, limit in limits.items():
+                observed = percentile(values[metric], slo["percentile"]) if len(values[metric]) >= slo["min_samples"] else None
+                if metric == "publish_to_uploaded":
+                    # Videos still in flight past the limit are breaches already, whatever the percentile says
+                    overdue = sum(1 for started in values["pending"] if now - started > limit * 60)
+                else:
+                    overdue = 0
+                key = (channel, metric)
+                if (observed is not None and observed > limit * 60) or overdue:
+                    breach = {"channel": channel, "metric": metric, "limit_minutes": limit, "overdue": overdue,
+                              f"p{slo['percentile']}_minutes": None if observed is None else observed / 60}
+                    breaches.append(breach)
+                    if key not in self.breached:
+                        self.breached.add(key)
+                        detail = f"p{slo['percentile']} {observed / 60:.1f} min" if observed is not None else ""
+                        if overdue:
+                            detail += f"{', ' if detail else ''}{overdue} video(s) still in flight past the limit"
+                        self.on_alert(f"🚨 SLO breach for {channel}: {metric.replace('_', ' ')} {detail} (limit {limit} min)")
+                elif key in self.breached:
+                    self.breached.discard(key)
+                    self.on_alert(f"✅ SLO recovered for {channel}: {metric.replace('_', ' ')}")
+        return breaches
+
+if __name__ == "__main__":
+    def fmt(value):
+        return "n/a" if value is None else f"{value:.1f}"
+
+    config = load_config()
+    tracker = LatencyTracker(store_path(config, "LATENCY_FILE"), load_slo(config))
+    for channel, stats in sorted(tracker.report().items(), key=lambda item: str(item[0])):
+        print(f"{channel}: {stats['videos']} video(s), {stats['pending']} pending")
+        for metric in METRICS:
+            values = stats[metric]
+            print(f"  {metric.replace('_', ' ')}: p50 {fmt(values['p50'])} min, p90 {fmt(values['p90'])} min, p99 {fmt(values['p99'])} min")
@@ -0,0 +1,40 @@
+import pytest
+from description_filter import compile_rules, local_filter, description_confidence
+
+RULES = compile_rules({})
+
+def filtered(description):
+    text, dropped_share = local_filter(description, RULES)
+    return text, description_confidence(text, RULES, dropped_share)
+
+@pytest.mark.parametrize("line", [
+    "In this video you'll learn how to subscribe to an RSS feed in any reader.",
+    "The links in a chain of trust are certificates.",
+    "x: the unknown variable we solve for.",
+    "Your subscription renews monthly unless cancelled.",
+    "Subscribers to the newsletter get the slides.",
+    "Subscribe to events with addEventListener and remove them when the component unmounts.",
+])
+def test_content_lines_are_kept(line):
+    text, confidence = filtered(f"{line}\nThe rest of the description.")
+    assert line in text
+    assert confidence == 1.0
+
+@pytest.mark.parametrize("line", [
+    "Please subscribe for more!",
+    "Don't forget to subscribe and hit the bell",
+    "Like and subscribe!",
+    "👉 Subscribe to my channel",
+    "SUBSCRIBE NOW",
+    "Link in bio",
+    "All links below:",
+    "Follow me on Instagram",
+    "X: @somechannel",
+])
+def test_calls_to_action_are_dropped(line):
+    text, _ = filtered(f"How a transistor works.\n{line}")
+    assert text == "How a transistor works."
+
+def test_prose_mentioning_links_below_asks_the_llm():
+    _, confidence = filtered("Sources for every claim are in the links below, check them out.\nHow a transistor works.")
+    assert confidence < 1.0
@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import time
+import threading
+import cProfile
+import tracemalloc
+import functools
+from contextlib import contextmanager
+from settings import PROJECT_FOLDER
+
+# Where per-job traces (and optional profiles) are written; relative paths are resolved against the project folder
+TRACE_FOLDER = os.path.join(PROJECT_FOLDER, os.environ.get("YT_TRACE_DIR", "traces"))
+
+# Comma-separated stage names to profile, e.g. "download,upload" or "all"
+PROFILE_ENV = "YT_PROFILE"
+
+_local = threading.local()
+
+def _profiled_stages():
+    """Return the set of stage names selected for profiling."""
+    value = os.environ.get(PROFILE_ENV, "")
+    return {stage.strip() for stage in value.split(",") if stage.strip()}
+
+class JobTrace:
+    """Collects timed spans for one job and appends them to <job_id>.trace.jsonl."""
+
+    def __init__(self, job_id, trace_folder=TRACE_FOLDER):
+        self.job_id = str(job_id)
+        self.trace_folder = trace_folder
+        self.path = os.path.join(trace_folder, f"{self.job_id}.trace.jsonl")
+        self._lock = threading.Lock()
+        self._profile_counter = 0
+        os.makedirs(trace_folder, exist_ok=True)
+
+    def write(self, event):
+        """Append a single trace event as one JSON line."""
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event) + "\n")
+
+    @contextmanager
+    def span(self, name, **args):
+        """Time a block of work and record it as a Chrome 'complete' event."""
+        profiler, started_tracemalloc = self._start_profiling(name)
+        start = time.perf_counter_ns()
+        wall_start = time.time_ns()
+        error = None
+        try:
+            yield args
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            duration = time.perf_counter_ns() - start
+            if error:
+                args["error"] = error
+            self.write({
+                "name": name,
+                "cat": "stage",
+                "ph": "X",
+                "ts": wall_start // 1000,
+                "dur": duration // 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {"job_id": self.job_id, **args},
+            })
+            self._stop_profiling(name, profiler, started_tracemalloc)
+
+    def _start_profiling(self, name):
+        stages = _profiled_stages()
+        if name not in stages and "all" not in stages:
+            return None, False
+        if getattr(_local, "profiling", False):
+            # Only one cProfile profiler can run per thread; the outer span's profile already covers this one
+            return None, False
+        _local.profiling = True
+
+        started_tracemalloc = False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracemalloc = True
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler, started_tracemalloc
+
+    def _stop_profiling(self, name, profiler, started_tracemalloc):
+        if profiler is None and not started_tracemalloc:
+            return
+
+        with self._lock:
+            self._profile_counter += 1
+            prefix = os.path.join(self.trace_folder, f"{self.job_id}.{name}.{self._profile_counter}")
+
+        if profiler is not None:
+            profiler.disable()
+            _local.profiling = False
+            profiler.dump_stats(f"{prefix}.prof")
+
+        if started_tracemalloc:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            with open(f"{prefix}.tracemalloc.txt", "w", encoding="utf-8") as f:
+                for stat in snapshot.statistics("lineno")[:50]:
+                    f.write(f"{stat}\n")
+
+def current_trace():
+    """Return the JobTrace active on this thread, if any."""
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+@contextmanager
+def job(job_id, trace_folder=TRACE_FOLDER):
+    """Make a new JobTrace current for the duration of the block."""
+    trace = JobTrace(job_id, trace_folder)
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    _local.stack.append(trace)
+    try:
+        with trace.span("job"):
+            yield trace
+    finally:
+        _local.stack.pop()
+
+@contextmanager
+def span(name, **args):
+    """Record a span on the current job; does nothing outside of a job."""
+    trace = current_trace()
+    if trace is None:
+        yield args
+        return
+    with trace.span(name, **args) as span_args:
+        yield span_args
+
+def traced(name):
+    """Decorator that wraps a function call in a span of the given name."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def yt_dlp_hooks():
+    """Return (progress_hook, postprocessor_hook) that emit download/merge spans for yt-dlp."""
+    trace = current_trace()
+    open_spans = {}
+
+    def _enter(key, name, **args):
+        if trace is None or key in open_spans:
+            return
+        context = trace.span(name, **args)
+        context.__enter__()
+        open_spans[key] = context
+
+    def _exit(key):
+        context = open_spans.pop(key, None)
+        if context is not None:
+            context.__exit__(None, None, None)
+
+    def progress_hook(d):
+        key = ("download", d.get("filename"))
+        if d["status"] == "downloading":
+            _enter(key, "download_stream", filename=os.path.basename(d.get("filename") or ""))
+        elif d["status"] in ("finished", "error"):
+            _exit(key)
+
+    def postprocessor_hook(d):
+        key = ("postprocess", d.get("postprocessor"))
+        name = "merge" if d.get("postprocessor") == "Merger" else f"postprocess:{d.get('postprocessor')}"
+        if d["status"] == "started":
+            _enter(key, name)
+        elif d["status"] == "finished":
+            _exit(key)
+
+    return progress_hook, postprocessor_hook
+
+def to_chrome_trace(jsonl_path, output_path=None):
+    """Convert a .trace.jsonl file into a Chrome trace (chrome://tracing, Perfetto) JSON file."""
+    if output_path is None:
+        output_path = jsonl_path.replace(".trace.jsonl", "") + ".chrome.json"
+
+    events = []
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return output_path
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python tracing.py <job>.trace.jsonl [output.json]")
+        sys.exit(1)
+    print(f"✅ Chrome trace written to {to_chrome_trace(*sys.argv[1:3])}")
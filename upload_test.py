@@ -1,11 +1,17 @@
 import os
-import json
 import subprocess
 import re
 import glob
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from google_auth_oauthlib.flow import InstalledAppFlow
+import yt_dlp
+import tracing
+from settings import load_config, store_path
+from dedupe_index import DedupeIndex, video_id_from_url
+from planner import fetch_info
+from metadata_store import MetadataStore
+from job_state import UPLOAD_CHUNK_SIZE
 
 # Set up API credentials (Download from Google Cloud Console)
 CLIENT_SECRET_FILE = r"C:\Users\moury\OneDrive\Desktop\Youtube Project\Upload-Test\client_secrets.json"
@@ -13,43 +19,34 @@ SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 
 DOWNLOAD_FOLDER = "test_upload"
 
+# This script uploads to a single account; this is its target channel name in the shared mirror index
+TARGET_CHANNEL = "default"
+
 # Ensure download folder exists
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
+config = load_config()
+metadata_store = MetadataStore(store_path(config, "METADATA_FILE"))
+
 def authenticate_youtube():
     """Authenticate with YouTube API and return the service object."""
     flow = InstalledAppFlow.from_client_secrets_file(CLIENT_SECRET_FILE, SCOPES)
     credentials = flow.run_local_server(port=8080)
     return build("youtube", "v3", credentials=credentials)
 
+@tracing.traced("metadata")
 def download_video(youtube_url):
-    """Download video and metadata using yt-dlp."""
-    command = [
-        "yt-dlp",
-        "--write-info-json",
-        "--skip-download",
-        "-o", os.path.join(DOWNLOAD_FOLDER, "%(title)s.%(ext)s"),
-        youtube_url
-    ]
-
+    """Fetch the video's metadata (without media) into the metadata store."""
     try:
-        subprocess.run(command, check=True)
+        metadata = metadata_store.put(fetch_info(youtube_url))
         print("Metadata downloaded successfully.")
-    except subprocess.CalledProcessError:
+    except yt_dlp.utils.DownloadError:
         print("Failed to download metadata.")
         return None, None
 
-    # Find metadata file
-    for file in os.listdir(DOWNLOAD_FOLDER):
-        if file.endswith(".json"):
-            with open(os.path.join(DOWNLOAD_FOLDER, file), "r", encoding="utf-8") as f:
-                metadata = json.load(f)
-            video_title = metadata["title"]
-            return video_title, metadata
-
-    print("Metadata file not found.")
-    return None, None
+    return metadata["title"], metadata
 
+@tracing.traced("upload")
 def upload_video(youtube, video_path, metadata):
     """Upload a video to YouTube with metadata."""
     request = youtube.videos().insert(
@@ -65,44 +62,54 @@ def upload_video(youtube, video_path, metadata):
                 "privacyStatus": "public"  # Change to "private" if needed
             }
         },
-        media_body=MediaFileUpload(video_path, chunksize=-1, resumable=True)
+        media_body=MediaFileUpload(video_path, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
     )
 
-    response = request.execute()
+    response = None
+    while response is None:
+        with tracing.span("upload_chunk"):
+            status, response = request.next_chunk()
     print(f"Uploaded successfully: https://www.youtube.com/watch?v={response['id']}")
+    return response["id"]
 
 if __name__ == "__main__":
     youtube_url = input("Enter YouTube video URL: ")
-    
-    youtube = authenticate_youtube()  # Authenticate with YouTube API
-    title, metadata = download_video(youtube_url)
-
-    if title and metadata:
-        # video_file = os.path.join(DOWNLOAD_FOLDER, f"{title}.mp4")
-
-        # Remove invalid characters from filename
-        safe_title = re.sub(r'[<>:"/\\|?*]', '', title)  # Remove special characters
-        # video_file = os.path.join(DOWNLOAD_FOLDER, f"{safe_title}.mp4")
-
-        # Get the actual file with any extension
-        video_files = glob.glob(os.path.join(DOWNLOAD_FOLDER, f"{safe_title}.*"))
-
-        if not video_files:
-            print(f"❌ Error: No video file found for {safe_title}")
-            exit(1)
-
-        video_file = video_files[0]  # Use the first matching file
-        print(f"✅ Found video file: {video_file}")
-
-
-        
-        # Download actual video
-        download_command = [
-            "yt-dlp",
-            "-o", video_file,
-            youtube_url
-        ]
-        subprocess.run(download_command, check=True)
-
-        # Upload to YouTube
-        upload_video(youtube, video_file, metadata)
+    source_id = video_id_from_url(youtube_url)
+    mirror_index = DedupeIndex(store_path(config, "MIRROR_INDEX_FILE"))
+    if mirror_index.contains(source_id, TARGET_CHANNEL):
+        print(f"⏭ Skipping {source_id}: already mirrored")
+        exit(0)
+
+    with tracing.job(source_id):
+        youtube = authenticate_youtube()  # Authenticate with YouTube API
+        title, metadata = download_video(youtube_url)
+
+        if title and metadata:
+            # video_file = os.path.join(DOWNLOAD_FOLDER, f"{title}.mp4")
+
+            # Remove invalid characters from filename
+            safe_title = re.sub(r'[<>:"/\\|?*]', '', title)  # Remove special characters
+            # video_file = os.path.join(DOWNLOAD_FOLDER, f"{safe_title}.mp4")
+
+            # Download actual video
+            download_command = [
+                "yt-dlp",
+                "-o", os.path.join(DOWNLOAD_FOLDER, f"{safe_title}.%(ext)s"),
+                youtube_url
+            ]
+            with tracing.span("download"):
+                subprocess.run(download_command, check=True)
+
+            # Get the actual file with any extension
+            video_files = glob.glob(os.path.join(DOWNLOAD_FOLDER, f"{glob.escape(safe_title)}.*"))
+            video_file = next((f for f in video_files if f.endswith(('.mp4', '.mkv', '.webm'))), None)
+
+            if not video_file:
+                print(f"❌ Error: No video file found for {safe_title}")
+                exit(1)
+
+            print(f"✅ Found video file: {video_file}")
+
+            # Upload to YouTube
+            video_id = upload_video(youtube, video_file, metadata)
+            mirror_index.record(source_id, TARGET_CHANNEL, video_id)
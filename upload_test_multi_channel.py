@@ -1,10 +1,15 @@
 import os
-import json
 import pickle
 import google_auth_oauthlib.flow
 import googleapiclient.discovery
 import googleapiclient.errors
 from yt_dlp import YoutubeDL
+import tracing
+from settings import load_config, store_path
+from dedupe_index import DedupeIndex, video_id_from_url
+from planner import load_rules, plan_video
+from metadata_store import MetadataStore
+from job_state import JobStore, UploadIntentConflict, UPLOAD_CHUNK_SIZE, reached, resumable_upload
 
 # Project folder setup
 PROJECT_FOLDER = os.path.dirname(os.path.abspath(__file__))
@@ -14,6 +19,10 @@ TOKENS_DIR = os.path.join(PROJECT_FOLDER, "tokens")  # Store multiple tokens
 # Ensure tokens directory exists
 os.makedirs(TOKENS_DIR, exist_ok=True)
 
+# Shared stores, the same files the other entry points use
+config = load_config()
+metadata_store = MetadataStore(store_path(config, "METADATA_FILE"))
+
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 
 # Function to authenticate YouTube API
@@ -78,14 +87,17 @@ def add_new_channel():
     return channel_name
 
 # Function to download a video and metadata
-def download_video(video_url, download_path="test_upload"):
+@tracing.traced("download")
+def download_video(video_url, download_path="test_upload", format_id="bestvideo+bestaudio/best"):
     os.makedirs(download_path, exist_ok=True)
+    progress_hook, postprocessor_hook = tracing.yt_dlp_hooks()
     ydl_opts = {
         "outtmpl": os.path.join(download_path, "%(id)s.%(ext)s"),
         "writethumbnail": True,
-        "writeinfojson": True,
         "merge_output_format": "mp4",
-        "format": "bestvideo+bestaudio/best"
+        "format": format_id,
+        "progress_hooks": [progress_hook],
+        "postprocessor_hooks": [postprocessor_hook],
     }
 
     with YoutubeDL(ydl_opts) as ydl:
@@ -93,14 +105,15 @@ def download_video(video_url, download_path="test_upload"):
 
     video_file = os.path.join(download_path, f"{info['id']}.mp4")
     thumbnail_file = os.path.join(download_path, f"{info['id']}.webp")
-    metadata_file = os.path.join(download_path, f"{info['id']}.info.json")
+    metadata_store.put(info)
 
-    return video_file, thumbnail_file, metadata_file, info
+    return video_file, thumbnail_file, info["id"], info
 
 # Function to upload video
-def upload_video(youtube, video_file, metadata_file, thumbnail_file):
-    with open(metadata_file, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
+@tracing.traced("upload")
+def upload_video(youtube, job_store, channel_name, video_file, source_id, thumbnail_file):
+    with tracing.span("metadata"):
+        metadata = metadata_store.get(source_id)
 
     request = youtube.videos().insert(
         part="snippet,status",
@@ -113,30 +126,55 @@ def upload_video(youtube, video_file, metadata_file, thumbnail_file):
             },
             "status": {"privacyStatus": "public"},
         },
-        media_body=googleapiclient.http.MediaFileUpload(video_file, chunksize=-1, resumable=True)
+        media_body=googleapiclient.http.MediaFileUpload(video_file, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
     )
 
-    response = request.execute()
-    video_id = response.get("id")
+    # Inserts at most once per source/target, resuming an interrupted session from an earlier run
+    video_id = resumable_upload(job_store, source_id, channel_name, request)
     print(f"✅ Video uploaded successfully: https://www.youtube.com/watch?v={video_id}")
 
     # Upload thumbnail
     if os.path.exists(thumbnail_file):
         try:
-            youtube.thumbnails().set(
-                videoId=video_id,
-                media_body=googleapiclient.http.MediaFileUpload(thumbnail_file)
-            ).execute()
+            with tracing.span("thumbnail"):
+                youtube.thumbnails().set(
+                    videoId=video_id,
+                    media_body=googleapiclient.http.MediaFileUpload(thumbnail_file)
+                ).execute()
             print(f"✅ Thumbnail uploaded successfully: {thumbnail_file}")
+            job_store.advance(source_id, channel_name, "thumbnailed")
         except googleapiclient.errors.HttpError as e:
             print(f"⚠ Error uploading thumbnail: {e}")
 
+    return video_id
+
 # Main script
 if __name__ == "__main__":
     selected_channel = select_channel()
     youtube = authenticate_youtube(selected_channel)
 
     video_url = input("Enter YouTube video URL: ").strip()
-    video_file, thumbnail_file, metadata_file, info = download_video(video_url)
-
-    upload_video(youtube, video_file, metadata_file, thumbnail_file)
+    source_id = video_id_from_url(video_url)
+    mirror_index = DedupeIndex(store_path(config, "MIRROR_INDEX_FILE"))
+    job_store = JobStore(store_path(config, "JOBS_FILE"))
+
+    with tracing.job(source_id):
+        job = job_store.get(source_id, selected_channel)
+        plan = None if reached(job, "uploaded") else plan_video(video_url, load_rules(config), mirror_index, selected_channel)
+
+        if plan is None:
+            # An earlier run finished the insert but stopped before recording it
+            mirror_index.record(source_id, selected_channel, job["data"]["video_id"])
+            print(f"⏭ Already uploaded to {selected_channel}: https://www.youtube.com/watch?v={job['data']['video_id']}")
+        elif not plan["accepted"]:
+            print(f"⏭ Skipping {source_id}: {plan['reason']}")
+        else:
+            job_store.advance(source_id, selected_channel, "planned", url=video_url, format=plan["format"])
+            video_file, thumbnail_file, source_id, info = download_video(video_url, format_id=plan["format"])
+            job_store.advance(source_id, selected_channel, "downloaded", video_file=video_file, thumbnail_file=thumbnail_file)
+
+            try:
+                video_id = upload_video(youtube, job_store, selected_channel, video_file, source_id, thumbnail_file)
+                mirror_index.record(source_id, selected_channel, video_id)
+            except UploadIntentConflict as e:
+                print(f"❌ {e}")
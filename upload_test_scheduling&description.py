@@ -4,21 +4,23 @@ import pickle
 import subprocess
 import re
 import glob
+import time
 import pytz
 from datetime import datetime
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from google_auth_oauthlib.flow import InstalledAppFlow
 from openai import OpenAI
+import tracing
+from settings import load_config, store_path
+from dedupe_index import DedupeIndex, video_id_from_url
+from planner import load_rules, plan_video, fetch_info
+from metadata_store import MetadataStore
+from job_state import JobStore, UploadIntentConflict, UPLOAD_CHUNK_SIZE, reached, resumable_upload, verify_upload
+from async_api import PooledYouTube
+from description_filter import compile_rules, local_filter, description_confidence
 
 # Load configuration
-CONFIG_FILE = "config.json"
-
-def load_config():
-    """Load configuration from file."""
-    with open(CONFIG_FILE, "r") as f:
-        return json.load(f)
-
 config = load_config()
 
 CLIENT_SECRET_FILE = config["CLIENT_SECRET_FILE"]
@@ -26,12 +28,23 @@ TOKENS_DIR = config["TOKENS_DIR"]
 DOWNLOAD_FOLDER = config["DOWNLOAD_FOLDER"]
 API_KEY = config["OPENAI_API_KEY"]
 USER_TIMEZONE = config.get("TIMEZONE", "UTC")
+MIRROR_INDEX_FILE = store_path(config, "MIRROR_INDEX_FILE")
+JOBS_FILE = store_path(config, "JOBS_FILE")
+METADATA_FILE = store_path(config, "METADATA_FILE")
+USE_ASYNC_API = config.get("USE_ASYNC_API", False)
+PLANNER_RULES = load_rules(config)
+DESCRIPTION_FILTER = {"min_confidence": 0.75, "stats_file": "description_filter_stats.json", "channels": {}}
+DESCRIPTION_FILTER.update(config.get("DESCRIPTION_FILTER", {}))
 
-SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+SCOPES = ["https://www.googleapis.com/auth/youtube.upload", "https://www.googleapis.com/auth/youtube.readonly"]
 
 # Ensure tokens directory exists
 os.makedirs(TOKENS_DIR, exist_ok=True)
 
+metadata_store = MetadataStore(METADATA_FILE)
+
+_description_rules = {}
+
 def authenticate_youtube(channel_name):
     """Authenticate with YouTube API and return the service object."""
     token_path = os.path.join(TOKENS_DIR, f"{channel_name}.pickle")
@@ -47,6 +60,8 @@ def authenticate_youtube(channel_name):
             pickle.dump(credentials, token_file)
         print(f"✅ Credentials saved for {channel_name}")
 
+    if USE_ASYNC_API:
+        return PooledYouTube(credentials)
     return build("youtube", "v3", credentials=credentials)
 
 def list_channels():
@@ -83,17 +98,19 @@ def add_new_channel():
     authenticate_youtube(channel_name)
     return channel_name
 
-def download_video(youtube_url):
-    """Download video, metadata, and thumbnail using yt-dlp."""
-    video_id = youtube_url.split("v=")[-1]
+@tracing.traced("download")
+def download_video(youtube_url, format_id=None):
+    """Download video and thumbnail using yt-dlp; metadata comes from the metadata store."""
+    video_id = video_id_from_url(youtube_url)
     command = [
         "yt-dlp",
-        "--write-info-json",
         "--write-thumbnail",
         "--merge-output-format", "mp4",
         "-o", os.path.join(DOWNLOAD_FOLDER, "%(id)s.%(ext)s"),
         youtube_url
     ]
+    if format_id:
+        command[1:1] = ["-f", format_id]
 
     try:
         subprocess.run(command, check=True)
@@ -101,13 +118,8 @@ def download_video(youtube_url):
         print("❌ Failed to download video.")
         return None, None, None
 
-    metadata_file = os.path.join(DOWNLOAD_FOLDER, f"{video_id}.info.json")
-    if not os.path.exists(metadata_file):
-        print("❌ Metadata file not found.")
-        return None, None, None
-
-    with open(metadata_file, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
+    with tracing.span("metadata"):
+        metadata = load_metadata(youtube_url)
 
     video_files = glob.glob(os.path.join(DOWNLOAD_FOLDER, f"{video_id}.*"))
     video_file = next((f for f in video_files if f.endswith(('.mp4', '.mkv', '.webm'))), None)
@@ -115,8 +127,53 @@ def download_video(youtube_url):
 
     return video_file, metadata, thumbnail_file
 
-def filter_description(original_description):
-    """Use ChatGPT to filter the video description."""
+def load_metadata(youtube_url):
+    """Return the trimmed metadata for a video, fetching it (without media) if it is not stored yet."""
+    metadata = metadata_store.get(video_id_from_url(youtube_url))
+    if metadata is None:
+        metadata = metadata_store.put(fetch_info(youtube_url))
+    return metadata
+
+def description_rules(metadata):
+    """Return the compiled rule set for a video's source channel (compiled once per channel)."""
+    key = metadata.get("channel_id") or metadata.get("channel") or ""
+    if key not in _description_rules:
+        _description_rules[key] = compile_rules(metadata, DESCRIPTION_FILTER["channels"])
+    return _description_rules[key]
+
+def record_filter_stats(tier, seconds):
+    """Add one filter run to the running totals and print how many LLM calls the local rules saved."""
+    stats_file = DESCRIPTION_FILTER["stats_file"]
+    stats = {"local": 0, "llm": 0, "local_seconds": 0.0, "llm_seconds": 0.0}
+    if os.path.exists(stats_file):
+        with open(stats_file, "r") as f:
+            stats.update(json.load(f))
+    stats[tier] += 1
+    stats[f"{tier}_seconds"] += seconds
+    with open(stats_file, "w") as f:
+        json.dump(stats, f, indent=4)
+
+    total = stats["local"] + stats["llm"]
+    summary = f"LLM calls avoided: {stats['local']}/{total} ({stats['local'] / total:.0%})"
+    if stats["llm"]:
+        saved = stats["local"] * stats["llm_seconds"] / stats["llm"] - stats["local_seconds"]
+        summary += f", ~{saved:.1f} s saved"
+    print(f"📊 {summary}")
+    return stats
+
+@tracing.traced("description_filter")
+def filter_description(original_description, metadata=None):
+    """Clean the description with local rules, asking ChatGPT only when the result still looks channel-specific."""
+    started = time.perf_counter()
+    rules = description_rules(metadata or {})
+    local_description, dropped_share = local_filter(original_description, rules)
+    confidence = description_confidence(local_description, rules, dropped_share)
+    if confidence >= DESCRIPTION_FILTER["min_confidence"]:
+        print(f"🧹 Description filtered locally (confidence {confidence:.2f}).")
+        record_filter_stats("local", time.perf_counter() - started)
+        return local_description
+
+    print(f"🤖 Local filter confidence {confidence:.2f}, asking ChatGPT...")
     client = OpenAI(api_key=API_KEY)
     system_prompt = "Remove all information related to the original channel, including links, calls to subscribe, and mentions, while keeping the rest of the description intact."
     
@@ -125,14 +182,15 @@ def filter_description(original_description):
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": original_description}
+                {"role": "user", "content": local_description}
             ]
         )
         filtered_description = response.choices[0].message.content
     except Exception as e:
         print(f"⚠ ChatGPT API error: {e}")
-        filtered_description = original_description
+        filtered_description = local_description
 
+    record_filter_stats("llm", time.perf_counter() - started)
     return filtered_description
 
 def convert_to_utc(local_time_str):
@@ -142,9 +200,9 @@ def convert_to_utc(local_time_str):
     local_time = local_tz.localize(local_time)
     return local_time.astimezone(pytz.utc)
 
-def upload_video(youtube, video_file, metadata, thumbnail_file, schedule_time=None):
-    """Upload a video to YouTube with metadata and thumbnail."""
-    filtered_description = filter_description(metadata.get("description", ""))
+def build_upload_body(metadata, schedule_time=None):
+    """Build the videos.insert body with a filtered description."""
+    filtered_description = filter_description(metadata.get("description", ""), metadata)
 
     copyright_notice = "\n\n⚠ This video is reuploaded for educational or informational purposes under fair use."
     final_description = filtered_description + copyright_notice
@@ -164,22 +222,38 @@ def upload_video(youtube, video_file, metadata, thumbnail_file, schedule_time=No
     if schedule_time:
         body["status"]["publishAt"] = schedule_time.isoformat()
 
+    return body
+
+@tracing.traced("upload")
+def upload_video(youtube, job_store, source_id, channel_name, video_file, body, thumbnail_file):
+    """Upload a video to YouTube with metadata and thumbnail, resuming from the job's last stage."""
+    job = job_store.get(source_id, channel_name)
+
     request = youtube.videos().insert(
         part="snippet,status",
         body=body,
-        media_body=MediaFileUpload(video_file, chunksize=-1, resumable=True)
+        media_body=MediaFileUpload(video_file, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
     )
 
-    response = request.execute()
-    video_id = response["id"]
+    video_id = resumable_upload(job_store, source_id, channel_name, request)
     print(f"✅ Video uploaded successfully: https://www.youtube.com/watch?v={video_id}")
 
-    if thumbnail_file:
-        try:
-            youtube.thumbnails().set(videoId=video_id, media_body=MediaFileUpload(thumbnail_file)).execute()
-            print(f"✅ Thumbnail uploaded successfully: {thumbnail_file}")
-        except Exception as e:
-            print(f"⚠ Error uploading thumbnail: {e}")
+    if not reached(job, "thumbnailed"):
+        if thumbnail_file:
+            try:
+                with tracing.span("thumbnail"):
+                    youtube.thumbnails().set(videoId=video_id, media_body=MediaFileUpload(thumbnail_file)).execute()
+                print(f"✅ Thumbnail uploaded successfully: {thumbnail_file}")
+                job_store.advance(source_id, channel_name, "thumbnailed")
+            except Exception as e:
+                print(f"⚠ Error uploading thumbnail: {e}")
+        else:
+            job_store.advance(source_id, channel_name, "thumbnailed")
+
+    if reached(job_store.get(source_id, channel_name), "thumbnailed"):
+        verify_upload(youtube, job_store, source_id, channel_name, video_id)
+
+    return video_id
 
 def get_scheduled_time():
     """Ask user for a scheduled upload time."""
@@ -196,13 +270,60 @@ def get_scheduled_time():
         except ValueError:
             print("❌ Invalid date format. Please use YYYY-MM-DD HH:MM.")
 
+def process_video(youtube, channel_name, youtube_url, job_store, mirror_index):
+    """Run one video through every job stage, skipping the stages it already completed."""
+    source_id = video_id_from_url(youtube_url)
+    job = job_store.get(source_id, channel_name)
+
+    if reached(job, "verified"):
+        print(f"⏭ Already uploaded to {channel_name}: https://www.youtube.com/watch?v={job['data']['video_id']}")
+        return
+
+    if not reached(job, "downloaded"):
+        plan = plan_video(youtube_url, PLANNER_RULES, mirror_index, channel_name)
+        if not plan["accepted"]:
+            print(f"⏭ Skipping video: {plan['reason']}")
+            return
+        metadata_store.put(plan["info"])
+        job_store.advance(source_id, channel_name, "planned", url=youtube_url, format=plan["format"])
+
+        video_file, metadata, thumbnail_file = download_video(youtube_url, plan["format"])
+        if not (video_file and metadata):
+            return
+        job = job_store.advance(
+            source_id, channel_name, "downloaded",
+            video_file=video_file,
+            thumbnail_file=thumbnail_file,
+        )
+
+    if not reached(job, "processed"):
+        metadata = load_metadata(youtube_url)
+        schedule_time = get_scheduled_time()
+        job = job_store.advance(source_id, channel_name, "processed", body=build_upload_body(metadata, schedule_time))
+
+    try:
+        video_id = upload_video(
+            youtube, job_store, source_id, channel_name,
+            job["data"]["video_file"], job["data"]["body"], job["data"]["thumbnail_file"]
+        )
+    except UploadIntentConflict as e:
+        print(f"❌ {e}")
+        return
+    mirror_index.record(source_id, channel_name, video_id)
+
 if __name__ == "__main__":
     selected_channel = select_channel()
     youtube = authenticate_youtube(selected_channel)
+    mirror_index = DedupeIndex(MIRROR_INDEX_FILE)
+    job_store = JobStore(JOBS_FILE)
 
-    youtube_url = input("Enter YouTube video URL: ").strip()
-    video_file, metadata, thumbnail_file = download_video(youtube_url)
+    unfinished = [job for job in job_store.unfinished(selected_channel) if job["data"].get("url")]
+    if unfinished:
+        print(f"🔄 Resuming {len(unfinished)} unfinished job(s)...")
+        for job in unfinished:
+            with tracing.job(job["source_id"]):
+                process_video(youtube, selected_channel, job["data"]["url"], job_store, mirror_index)
 
-    if video_file and metadata:
-        schedule_time = get_scheduled_time()
-        upload_video(youtube, video_file, metadata, thumbnail_file, schedule_time)
+    youtube_url = input("Enter YouTube video URL: ").strip()
+    with tracing.job(video_id_from_url(youtube_url)):
+        process_video(youtube, selected_channel, youtube_url, job_store, mirror_index)
@@ -1,5 +1,4 @@
 import os
-import json
 import subprocess
 import re
 import glob
@@ -7,6 +6,12 @@ import pickle
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from google_auth_oauthlib.flow import InstalledAppFlow
+import tracing
+from settings import load_config, store_path
+from dedupe_index import DedupeIndex, video_id_from_url
+from planner import fetch_info
+from metadata_store import MetadataStore
+from job_state import UPLOAD_CHUNK_SIZE
 
 # Set up API credentials (Download from Google Cloud Console)
 CLIENT_SECRET_FILE = r"C:\Users\moury\OneDrive\Desktop\Youtube Project\Upload-Test\client_secrets.json"
@@ -16,6 +21,12 @@ SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 DOWNLOAD_FOLDER = "test_upload"
 os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
 
+config = load_config()
+metadata_store = MetadataStore(store_path(config, "METADATA_FILE"))
+
+# This script uploads to a single account; this is its target channel name in the shared mirror index
+TARGET_CHANNEL = "default"
+
 def authenticate_youtube():
     """Authenticate with YouTube API and return the service object."""
     credentials = None
@@ -37,13 +48,13 @@ def authenticate_youtube():
 
     return build("youtube", "v3", credentials=credentials)
 
+@tracing.traced("download")
 def download_video(youtube_url):
-    """Download video, metadata, and thumbnail using yt-dlp."""
-    video_id = youtube_url.split("v=")[-1]
+    """Download video and thumbnail using yt-dlp; metadata comes from the metadata store."""
+    video_id = video_id_from_url(youtube_url)
 
     command = [
         "yt-dlp",
-        "--write-info-json",
         "--write-thumbnail",
         "--merge-output-format", "mp4",
         "-o", os.path.join(DOWNLOAD_FOLDER, "%(id)s.%(ext)s"),
@@ -52,20 +63,16 @@ def download_video(youtube_url):
 
     try:
         subprocess.run(command, check=True)
-        print("✅ Metadata & thumbnail downloaded successfully.")
+        print("✅ Video & thumbnail downloaded successfully.")
     except subprocess.CalledProcessError:
-        print("❌ Failed to download metadata.")
+        print("❌ Failed to download video.")
         return None, None, None
 
-    # Find metadata file
-    metadata_file = os.path.join(DOWNLOAD_FOLDER, f"{video_id}.info.json")
-    if not os.path.exists(metadata_file):
-        print("❌ Metadata file not found.")
-        return None, None, None
-
-    # Load metadata
-    with open(metadata_file, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
+    # Load metadata, fetching it (without media) if it is not stored yet
+    with tracing.span("metadata"):
+        metadata = metadata_store.get(video_id)
+        if metadata is None:
+            metadata = metadata_store.put(fetch_info(youtube_url))
 
     # Find the actual video file
     video_files = glob.glob(os.path.join(DOWNLOAD_FOLDER, f"{video_id}.*"))
@@ -82,6 +89,7 @@ def download_video(youtube_url):
 
     return video_file, metadata, thumbnail_file
 
+@tracing.traced("upload")
 def upload_video(youtube, video_file, metadata, thumbnail_file):
     """Upload a video to YouTube with metadata and thumbnail."""
     request = youtube.videos().insert(
@@ -97,28 +105,41 @@ def upload_video(youtube, video_file, metadata, thumbnail_file):
                 "privacyStatus": "public"
             }
         },
-        media_body=MediaFileUpload(video_file, chunksize=-1, resumable=True)
+        media_body=MediaFileUpload(video_file, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
     )
 
-    response = request.execute()
+    response = None
+    while response is None:
+        with tracing.span("upload_chunk"):
+            status, response = request.next_chunk()
     video_id = response["id"]
     print(f"✅ Video uploaded successfully: https://www.youtube.com/watch?v={video_id}")
 
     # Upload thumbnail if available
     if thumbnail_file:
         try:
-            youtube.thumbnails().set(videoId=video_id, media_body=MediaFileUpload(thumbnail_file)).execute()
+            with tracing.span("thumbnail"):
+                youtube.thumbnails().set(videoId=video_id, media_body=MediaFileUpload(thumbnail_file)).execute()
             print(f"✅ Thumbnail uploaded successfully: {thumbnail_file}")
         except Exception as e:
             print(f"⚠ Error uploading thumbnail: {e}")
     else:
         print("⚠ No thumbnail found, skipping thumbnail upload.")
 
+    return video_id
+
 if __name__ == "__main__":
     youtube_url = input("Enter YouTube video URL: ")
+    source_id = video_id_from_url(youtube_url)
+    mirror_index = DedupeIndex(store_path(config, "MIRROR_INDEX_FILE"))
+    if mirror_index.contains(source_id, TARGET_CHANNEL):
+        print(f"⏭ Skipping {source_id}: already mirrored")
+        exit(0)
 
     youtube = authenticate_youtube()
-    video_file, metadata, thumbnail_file = download_video(youtube_url)
+    with tracing.job(source_id):
+        video_file, metadata, thumbnail_file = download_video(youtube_url)
 
-    if video_file and metadata:
-        upload_video(youtube, video_file, metadata, thumbnail_file)
+        if video_file and metadata:
+            video_id = upload_video(youtube, video_file, metadata, thumbnail_file)
+            mirror_index.record(source_id, TARGET_CHANNEL, video_id)